@@ -0,0 +1,238 @@
+"""
+Bulk export of every scraped listing to CSV and (when pyarrow is installed) Parquet.
+
+Rows are read folder by folder and written in batches, so memory stays flat
+however many listings there are. Numeric columns are typed: price (float),
+bedrooms / bathrooms (int) and sqft (float; square metres are converted).
+
+Each listing folder is read from listing.json when present. Older folders
+only have property_info.txt / description.txt; their URL comes from the
+matching line of Links.txt (line 1 -> folder "1", as the sheet builder does).
+
+rightmove_properties.xlsx is built on top of this export; see
+rightmove_images/build_rightmove_sheet_from_link.py.
+"""
+import csv
+import json
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Optional
+
+# ========== CONFIG ==========
+EXPORT_CSV = "listings.csv"
+EXPORT_PARQUET = "listings.parquet"
+BATCH_SIZE = 5000
+LINKS_CANDIDATES = ["Links.txt", "links.txt"]
+# ===========================
+
+COLUMNS = [
+    "folder", "url", "address", "price_text", "price", "house_type",
+    "bedrooms", "bathrooms", "size_text", "sqft", "image_count", "image_path", "description",
+]
+NUMERIC_COLUMNS = {"price": float, "bedrooms": int, "bathrooms": int, "sqft": float, "image_count": int}
+
+SQM_TO_SQFT = 10.7639
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+# ----- Field parsers -----
+def parse_price_to_number(price_text: Optional[str]) -> Optional[float]:
+    """'£350,000' -> 350000.0. For a range ('£350,000 - £400,000') the first price is used."""
+    if not price_text:
+        return None
+    m = _NUMBER_RE.search(price_text)
+    if not m:
+        return None
+    try:
+        return float(m.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def parse_count(text: Optional[str]) -> Optional[int]:
+    """'5 bedrooms' -> 5. Returns None for 'N/A' or anything without a number."""
+    if not text:
+        return None
+    m = _NUMBER_RE.search(text)
+    if not m:
+        return None
+    try:
+        return int(float(m.group(0).replace(",", "")))
+    except ValueError:
+        return None
+
+
+def parse_sqft(text: Optional[str]) -> Optional[float]:
+    """'3,968 sq ft' -> 3968.0, '120 sq m' -> 1291.7. Bare numbers are taken as sq ft."""
+    if not text:
+        return None
+    m = _NUMBER_RE.search(text)
+    if not m:
+        return None
+    value = float(m.group(0).replace(",", ""))
+    low = text.lower()
+    if ("sq m" in low or "sqm" in low or "m²" in low) and "ft" not in low:
+        value *= SQM_TO_SQFT
+    return round(value, 1)
+
+
+# ----- Reading listing folders -----
+def _read_links(root: str) -> Dict[str, str]:
+    for name in LINKS_CANDIDATES:
+        path = os.path.join(root, name)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                return {str(i): line.strip() for i, line in enumerate(f, start=1) if line.strip()}
+    return {}
+
+
+def _read_text(path: str) -> str:
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read().strip()
+
+
+def _read_property_info(path: str):
+    address = price = ""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for raw in f:
+                line = raw.strip()
+                low = line.lower()
+                if low.startswith("address:"):
+                    address = line.split(":", 1)[1].strip()
+                elif low.startswith("price:"):
+                    price = line.split(":", 1)[1].strip()
+    return address, price
+
+
+def _folder_sort_key(name: str):
+    return (0, int(name), "") if name.isdigit() else (1, 0, name)
+
+
+def _na(value: Optional[str]) -> str:
+    return "" if value in (None, "N/A", "Not found") else value
+
+
+def read_listing_record(folder_path: str, folder_name: str, links: Dict[str, str]) -> Optional[Dict]:
+    """Build one export row from a listing folder, or None if it holds no scraped data."""
+    listing_path = os.path.join(folder_path, "listing.json")
+    if os.path.exists(listing_path):
+        with open(listing_path, "r", encoding="utf-8") as f:
+            listing = json.load(f)
+        image_count = len(listing.get("img_urls") or [])
+    else:
+        address, price = _read_property_info(os.path.join(folder_path, "property_info.txt"))
+        if not address and not price:
+            return None
+        listing = {
+            "url": links.get(folder_name, ""),
+            "address": address,
+            "price": price,
+            "description": _read_text(os.path.join(folder_path, "description.txt")),
+        }
+        image_count = sum(1 for f in os.listdir(folder_path) if f.startswith("image_") and f.endswith(".jpg"))
+
+    image_path = os.path.join(folder_path, "image_1.jpg")
+    return {
+        "folder": folder_name,
+        "url": listing.get("url") or links.get(folder_name, ""),
+        "address": _na(listing.get("address")),
+        "price_text": _na(listing.get("price")),
+        "price": parse_price_to_number(_na(listing.get("price"))),
+        "house_type": _na(listing.get("house_type")),
+        "bedrooms": parse_count(listing.get("bedrooms")),
+        "bathrooms": parse_count(listing.get("bathrooms")),
+        "size_text": _na(listing.get("size_sqft")),
+        "sqft": parse_sqft(listing.get("size_sqft")),
+        "image_count": image_count,
+        "image_path": image_path if os.path.exists(image_path) else "",
+        "description": _na(listing.get("description")),
+    }
+
+
+def iter_listing_records(root: str) -> Iterator[Dict]:
+    """Yield one record per listing folder under root, numbered folders first."""
+    links = _read_links(root)
+    names = sorted((e.name for e in os.scandir(root) if e.is_dir() and not e.name.startswith("__")),
+                   key=_folder_sort_key)
+    for name in names:
+        try:
+            record = read_listing_record(os.path.join(root, name), name, links)
+        except Exception as e:
+            print(f"[WARN] Skipping {name}: {e}")
+            continue
+        if record is not None:
+            yield record
+
+
+# ----- Writers -----
+def _parquet_writer(path: str):
+    """Return (pyarrow module, ParquetWriter), or (None, None) when pyarrow isn't installed."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("[INFO] pyarrow not installed; skipping Parquet export.")
+        return None, None
+    types = {"price": pa.float64(), "bedrooms": pa.int32(), "bathrooms": pa.int32(),
+             "sqft": pa.float64(), "image_count": pa.int32()}
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in COLUMNS])
+    return pa, pq.ParquetWriter(path, schema, compression="snappy")
+
+
+def _write_parquet_batch(pa, writer, batch: List[Dict]) -> None:
+    columns = {c: [r[c] for r in batch] for c in COLUMNS}
+    writer.write_table(pa.Table.from_pydict(columns, schema=writer.schema))
+
+
+def export_listings(root: str, csv_path: Optional[str] = None, parquet_path: Optional[str] = None,
+                    parquet: bool = True, batch_size: int = BATCH_SIZE) -> Dict:
+    """Write every listing under root to CSV (and Parquet). Returns a summary dict."""
+    start = time.perf_counter()
+    csv_path = csv_path or os.path.join(root, EXPORT_CSV)
+    parquet_path = parquet_path or os.path.join(root, EXPORT_PARQUET)
+
+    pa, pq_writer = _parquet_writer(parquet_path + ".tmp") if parquet else (None, None)
+    rows = 0
+    batch: List[Dict] = []
+    csv_tmp = csv_path + ".tmp"
+    try:
+        with open(csv_tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for record in iter_listing_records(root):
+                batch.append(record)
+                rows += 1
+                if len(batch) >= batch_size:
+                    writer.writerows(batch)
+                    if pq_writer:
+                        _write_parquet_batch(pa, pq_writer, batch)
+                    batch = []
+            if batch:
+                writer.writerows(batch)
+                if pq_writer:
+                    _write_parquet_batch(pa, pq_writer, batch)
+    finally:
+        if pq_writer:
+            pq_writer.close()
+    os.replace(csv_tmp, csv_path)
+    if pq_writer:
+        os.replace(parquet_path + ".tmp", parquet_path)
+
+    elapsed = time.perf_counter() - start
+    written = [csv_path] + ([parquet_path] if pq_writer else [])
+    print(f"[DONE] Exported {rows} listing(s) to {', '.join(written)} in {elapsed:.2f}s")
+    return {"rows": rows, "csv": csv_path, "parquet": parquet_path if pq_writer else None}
+
+
+def read_export_csv(csv_path: str) -> Iterator[Dict]:
+    """Stream rows back from an export CSV with numeric columns converted (empty -> None)."""
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            for col, cast in NUMERIC_COLUMNS.items():
+                value = row.get(col)
+                row[col] = cast(value) if value not in (None, "") else None
+            yield row
@@ -0,0 +1,109 @@
+"""
+Check downloader.py against a local stand-in for the Rightmove media server.
+
+    python check_downloader.py
+
+Serves generated photos with http.server from a temporary folder:
+
+* IMG_0 / IMG_1: gallery (_max_656x437), small (_max_296x197) and full-size
+  originals,
+* IMG_2: gallery and original only, so its small variant 404s and the
+  download must fall back to the gallery URL,
+* IMG_3: a URL without a size token, fetched unchanged.
+
+Then runs download_images, download_hero and report_listing_bytes and checks
+what landed on disk and what was counted. Needs Pillow and requests; nothing
+is sent to Rightmove.
+"""
+import functools
+import http.server
+import os
+import sys
+import tempfile
+import threading
+
+from PIL import Image
+
+import downloader
+
+GALLERY = (656, 437)
+FULL = (1600, 1067)
+
+
+def _make_photo(path, size, shade):
+    Image.new("RGB", size, (shade, 90, 255 - shade)).save(path, quality=90)
+
+
+def _build_media(folder):
+    """Write the stand-in media files and return the gallery URLs' paths."""
+    paths = []
+    for i in range(3):
+        _make_photo(os.path.join(folder, f"IMG_{i}.jpg"), FULL, 60 * i)
+        _make_photo(os.path.join(folder, f"IMG_{i}_max_{GALLERY[0]}x{GALLERY[1]}.jpg"), GALLERY, 60 * i)
+        if i != 2:
+            small = downloader.SMALL_VARIANT
+            _make_photo(os.path.join(folder, f"IMG_{i}_max_{small[0]}x{small[1]}.jpg"), small, 60 * i)
+        paths.append(f"IMG_{i}_max_{GALLERY[0]}x{GALLERY[1]}.jpg")
+    _make_photo(os.path.join(folder, "IMG_3.jpg"), GALLERY, 200)
+    paths.append("IMG_3.jpg")
+    return paths
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _check(label, ok):
+    print(f"[{'OK' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def main():
+    with tempfile.TemporaryDirectory() as media, tempfile.TemporaryDirectory() as out:
+        paths = _build_media(media)
+        server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(_QuietHandler, directory=media))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}/"
+        img_urls = [base + p for p in paths]
+
+        downloader.REPORT_SAVINGS = True
+        try:
+            report = downloader.download_images(img_urls, out)
+            hero_bytes = downloader.download_hero(img_urls, out, index=1)
+            listing = downloader.report_listing_bytes(report, hero_bytes)
+        finally:
+            server.shutdown()
+
+        def size_of(name):
+            with Image.open(os.path.join(out, name)) as im:
+                return im.size
+
+        gallery_bytes = sum(os.path.getsize(os.path.join(media, p)) for p in paths)
+        small_bytes = sum(os.path.getsize(os.path.join(media, f"IMG_{i}_max_296x197.jpg")) for i in range(2))
+        fallback_bytes = os.path.getsize(os.path.join(media, paths[2])) + os.path.getsize(os.path.join(media, paths[3]))
+
+        results = [
+            _check("variant_url rewrites and strips the size token",
+                   downloader.variant_url(img_urls[0], (296, 197)).endswith("IMG_0_max_296x197.jpg")
+                   and downloader.variant_url(img_urls[0], None).endswith("IMG_0.jpg")
+                   and downloader.variant_url(img_urls[3], (296, 197)) == img_urls[3]),
+            _check("non-hero photo was fetched at the small variant",
+                   size_of("image_2.jpg") == downloader.SMALL_VARIANT),
+            _check("missing small variant fell back to the gallery URL", size_of("image_3.jpg") == GALLERY),
+            _check("URL without a size token was fetched unchanged", size_of("image_4.jpg") == GALLERY),
+            _check("hero is the full-size original in image_1.jpg and source_1.jpg",
+                   size_of("image_1.jpg") == FULL and size_of("source_1.jpg") == FULL),
+            _check("small-variant bytes counted", report["bytes_downloaded"] == small_bytes + fallback_bytes),
+            _check("gallery baseline counted", report["bytes_gallery"] == gallery_bytes),
+            _check("net bytes include the hero",
+                   listing["bytes_total"] == report["bytes_downloaded"] + hero_bytes
+                   and listing["bytes_saved"] == gallery_bytes - listing["bytes_total"]),
+            _check("no .part files left behind", not [f for f in os.listdir(out) if f.endswith(".part")]),
+        ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
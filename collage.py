@@ -0,0 +1,362 @@
+"""
+Render stage: draw the price/address banner and stats icons under the first photo.
+
+Only this module (and the sheet builder) imports Pillow.
+"""
+import math
+import os
+import re
+import threading
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+try:
+    import psutil  # optional: per-render RSS sampling on every OS
+except ImportError:
+    psutil = None
+
+font_path = "arial.ttf"  # adjust if needed
+
+# Longest side of the photo part of the collage. Larger photos are decoded at a
+# reduced scale (JPEG draft mode) and resized down; None keeps full resolution.
+MAX_OUTPUT_DIM = 2048
+# A memory budget never shrinks the photo's longest side below this; the
+# render warns instead.
+MIN_BUDGET_DIM = 640
+# Fonts, paddings and icons below are sized for a photo at least this wide and
+# are scaled down proportionally for narrower ones.
+LAYOUT_REFERENCE_WIDTH = 1000
+
+padding = 40
+line_spacing = 10
+gap_price_address = 10
+gap_text_icons = 30
+
+# ---------- ICONS (PNG) ----------
+icon_paths = [
+    "icons/house.png",      # house type
+    "icons/bed.png",        # bedrooms
+    "icons/bathroom.png",   # bathrooms
+    "icons/floorplan.png"   # square feet
+]
+
+# slightly smaller icons
+target_icon_h = 64  # was 96
+side_padding = 40   # left/right padding for the row
+gap_icon_value = 8  # icon -> value
+# no spacing_x needed—using equal columns
+
+
+# ---------- TEXT WRAP HELPERS ----------
+def text_wh(draw, text, font):
+    l, t, r, b = draw.textbbox((0, 0), text, font=font)
+    return r - l, b - t
+
+
+def wrap_text_to_width(draw, text, font, max_w):
+    words, lines, cur = text.split(), [], ""
+    for w in words:
+        test = w if not cur else f"{cur} {w}"
+        wpx, _ = text_wh(draw, test, font)
+        if wpx <= max_w:
+            cur = test
+        else:
+            if cur: lines.append(cur)
+            cur = w
+    if cur: lines.append(cur)
+    return lines
+
+
+# Optional: light normalization for numbers (keeps original fallback if not found)
+def extract_number(s, default="N/A"):
+    if not s: return default
+    m = re.search(r"\d[\d,\.]*", s)
+    return m.group(0) if m else default
+
+
+def stat_display_values(listing):
+    """Return the four icon captions (type, beds, baths, size) for a listing dict."""
+    house_type = listing.get("house_type") or "N/A"
+    size_sqft = listing.get("size_sqft") or "N/A"
+
+    bedrooms_disp  = extract_number(listing.get("bedrooms"),  "N/A")
+    bathrooms_disp = extract_number(listing.get("bathrooms"), "N/A")
+    # size may be like "3,968 sq ft" already; keep as-is if contains "ft", else show number
+    size_disp = size_sqft if ("ft" in size_sqft.lower() or "sqm" in size_sqft.lower() or "m²" in size_sqft.lower()) else extract_number(size_sqft, "N/A")
+
+    # Type may be "Terraced", "Freehold", etc.—keep full text
+    type_disp = house_type if house_type != "N/A" else "N/A"
+
+    print(f"[INFO] Final stats -> Type: {type_disp} | Beds: {bedrooms_disp} | Baths: {bathrooms_disp} | Size: {size_disp}")
+    return [type_disp, bedrooms_disp, bathrooms_disp, size_disp]
+
+
+def _fit(size, max_dim):
+    """Scale (w, h) down so the longest side is at most max_dim (never up)."""
+    w, h = size
+    if not max_dim or max(w, h) <= max_dim:
+        return w, h
+    scale = max_dim / max(w, h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def _draft_size(size, target):
+    """Size the JPEG decoder produces for draft(target): the smallest 1/1, 1/2, 1/4, 1/8 scale still >= target."""
+    w, h = size
+    for scale in (8, 4, 2):
+        if w // scale >= target[0] and h // scale >= target[1]:
+            return math.ceil(w / scale), math.ceil(h / scale)
+    return w, h
+
+
+def estimate_render_bytes(source_size, target_size, banner_height, is_jpeg=True):
+    """Pixel-buffer bytes held at the peak of a render: the decoded photo plus the output canvas."""
+    decoded = _draft_size(source_size, target_size) if is_jpeg else source_size
+    canvas = (target_size[0], target_size[1] + banner_height)
+    resized = target_size if decoded != target_size else (0, 0)
+    return 3 * (decoded[0] * decoded[1] + resized[0] * resized[1] + canvas[0] * canvas[1])
+
+
+def _load_layout(width, price, address):
+    """
+    Fonts, spacing and icons for a photo `width` px wide, plus the wrapped text.
+
+    Everything is scaled by width / LAYOUT_REFERENCE_WIDTH (never up), so a
+    small collage gets a proportionally small banner rather than 80px text.
+    """
+    scale = min(1.0, width / LAYOUT_REFERENCE_WIDTH)
+
+    def px(v):
+        return max(1, round(v * scale))
+
+    lay = {
+        "padding": px(padding),
+        "line_spacing": px(line_spacing),
+        "gap_price_address": px(gap_price_address),
+        "gap_text_icons": px(gap_text_icons),
+        "side_padding": px(side_padding),
+        "gap_icon_value": px(gap_icon_value),
+        "title_font": ImageFont.truetype(font_path, size=px(80)),
+        "subtitle_font": ImageFont.truetype(font_path, size=px(50)),
+        "value_font": ImageFont.truetype(font_path, size=px(40)),
+    }
+
+    icons = []
+    for pth in icon_paths:
+        ico = Image.open(pth).convert("RGBA")
+        # don't upscale -> avoids blur
+        t_h = min(px(target_icon_h), ico.height)
+        ico = ImageOps.contain(ico, (10_000, t_h), method=Image.LANCZOS)
+        icons.append(ico)
+    lay["icons"] = icons
+
+    # ---------- MEASURE EVERYTHING FIRST ----------
+    measure = Image.new("RGB", (width, 10), "black")
+    m_draw = ImageDraw.Draw(measure)
+    max_text_w = width - 2 * lay["padding"]
+
+    lay["price_lines"] = wrap_text_to_width(m_draw, price, lay["title_font"], max_text_w)
+    lay["addr_lines"]  = wrap_text_to_width(m_draw, address, lay["subtitle_font"], max_text_w)
+
+    _, lay["title_h"] = text_wh(m_draw, "Ay", lay["title_font"])
+    _, lay["sub_h"]   = text_wh(m_draw, "Ay", lay["subtitle_font"])
+    _, val_h = text_wh(m_draw, "9999", lay["value_font"])
+
+    text_block_h = (
+        len(lay["price_lines"]) * (lay["title_h"] + lay["line_spacing"]) +
+        lay["gap_price_address"] +
+        len(lay["addr_lines"])  * (lay["sub_h"] + lay["line_spacing"])
+    )
+
+    # row height for banner sizing
+    icons_row_h = max(i.size[1] for i in icons) + lay["gap_icon_value"] + val_h
+
+    # ---------- COMPUTE BANNER HEIGHT DYNAMICALLY ----------
+    lay["banner_height"] = (
+        lay["padding"] +
+        text_block_h +
+        lay["gap_text_icons"] +
+        icons_row_h +
+        lay["padding"]
+    )
+    return lay
+
+
+def _current_rss():
+    """Resident set size of this process in bytes, or None if it can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:  # Linux without psutil
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """
+    Sample this process's RSS on a background thread while a block runs.
+
+    ru_maxrss is a high-water mark for the whole process, so in a batch every
+    render after the largest one would report the same figure. The sampler
+    records the RSS at start and the highest value seen until stop(), which
+    is what one render actually used. Allocations shorter than the sampling
+    interval can be missed.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline = self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def start(self):
+        if self.baseline is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Return (baseline, peak) in bytes, or (None, None) if RSS isn't readable."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            rss = _current_rss()
+            self.peak = max(self.peak, rss or 0)
+        return self.baseline, self.peak
+
+
+def render_collage(image_path, output_path, listing, max_dim=MAX_OUTPUT_DIM, memory_budget_mb=None):
+    """
+    Load image_path, add the banner for `listing` underneath and save to output_path.
+
+    The photo is scaled to fit max_dim, and further if the render's estimated
+    pixel memory would exceed memory_budget_mb. JPEGs are decoded straight at
+    the reduced scale, and only one full-size canvas (the output) is allocated.
+    Returns a report dict with the output size and peak memory figures:
+    peak_pixel_mb (estimate), and where RSS can be read, peak_rss_mb (process
+    RSS at the render's peak) and render_rss_mb (what the render added).
+    """
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Image not found at {image_path}. Cannot create collage.")
+
+    sampler = RssSampler().start()
+    try:
+        report = _render(image_path, output_path, listing, max_dim, memory_budget_mb)
+    finally:
+        baseline, peak = sampler.stop()
+    report["peak_rss_mb"] = peak / 2**20 if peak is not None else None
+    report["render_rss_mb"] = (peak - baseline) / 2**20 if peak is not None else None
+
+    (sw, sh), (ow, oh) = report["source_size"], report["photo_size"]
+    print(f"[INFO] Render memory: ~{report['peak_pixel_mb']:.1f} MB pixel buffers ({sw}x{sh} -> {ow}x{oh})"
+          + (f", +{report['render_rss_mb']:.0f} MB RSS during the render (peak {report['peak_rss_mb']:.0f} MB)"
+             if peak is not None else ""))
+    return report
+
+
+def _render(image_path, output_path, listing, max_dim, memory_budget_mb):
+
+    price = listing.get("price") or "Not found"
+    address = listing.get("address") or "Not found"
+    value_texts = stat_display_values(listing)
+
+    # ---------- LOAD BASE (reduced decode) ----------
+    img = Image.open(image_path)
+    is_jpeg = img.format == "JPEG"
+    source_size = img.size
+
+    # Pick the output size from the header alone, shrinking until the render fits the budget
+    target = _fit(source_size, max_dim)
+    lay = _load_layout(target[0], price, address)
+    estimate = estimate_render_bytes(source_size, target, lay["banner_height"], is_jpeg)
+    budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+    if budget and estimate > budget:
+        # Only JPEGs decode at a reduced scale; other formats are decoded at full
+        # size whatever the output, so shrinking can't bring the peak under that
+        floor = 0 if is_jpeg else estimate_render_bytes(source_size, (1, 1), 0, is_jpeg)
+        if floor >= budget:
+            print(f"[WARN] {img.format} source is decoded at full size ({source_size[0]}x{source_size[1]}); "
+                  f"the {memory_budget_mb} MB budget can't be met by shrinking the collage")
+        while estimate > budget and max(target) > MIN_BUDGET_DIM and floor < budget:
+            shrink = math.sqrt(budget / estimate) * 0.95
+            target = _fit(target, max(MIN_BUDGET_DIM, int(max(target) * shrink)))
+            lay = _load_layout(target[0], price, address)
+            estimate = estimate_render_bytes(source_size, target, lay["banner_height"], is_jpeg)
+        if estimate > budget and floor < budget:
+            print(f"[WARN] Render needs ~{estimate / 2**20:.0f} MB, over the {memory_budget_mb} MB budget, "
+                  f"at the minimum size {target[0]}x{target[1]} (MIN_BUDGET_DIM)")
+
+    if is_jpeg and target != source_size:
+        img.draft("RGB", target)  # the decoder scales by 1/2, 1/4 or 1/8 while decoding
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size != target:
+        img = img.resize(target, Image.LANCZOS, reducing_gap=2.0)  # reduce() first for non-JPEG sources
+    original_width, original_height = img.size
+
+    new_height = original_height + lay["banner_height"]
+    new_img = Image.new("RGB", (original_width, new_height), color=(0, 0, 0))
+    new_img.paste(img, (0, 0))
+    img.close()
+    del img
+    draw = ImageDraw.Draw(new_img)
+
+    # ---------- DRAW TEXT ----------
+    pad = lay["padding"]
+    y = original_height + pad
+    for line in lay["price_lines"]:
+        draw.text((pad, y), line, font=lay["title_font"], fill=(255, 255, 255))
+        y += lay["title_h"] + lay["line_spacing"]
+
+    y += lay["gap_price_address"]
+    for line in lay["addr_lines"]:
+        draw.text((pad, y), line, font=lay["subtitle_font"], fill=(255, 255, 255))
+        y += lay["sub_h"] + lay["line_spacing"]
+
+    # ---------- DRAW ICONS (EQUAL COLUMNS) + VALUES UNDER ----------
+    y += lay["gap_text_icons"]
+    row_y = int(y)
+
+    icons = lay["icons"]
+    n = len(icons)
+    inner_w = original_width - 2 * lay["side_padding"]
+    col_w = inner_w / n  # may be float; we center per-column
+
+    for i, (ico, val) in enumerate(zip(icons, value_texts)):
+        # column center
+        center_x = int(lay["side_padding"] + (i + 0.5) * col_w)
+
+        # icon centered in its column
+        icon_x = int(center_x - ico.width // 2)
+        icon_y = int(row_y)
+        new_img.paste(ico, (icon_x, icon_y), ico)
+
+        # value centered under icon
+        val_w, val_hh = text_wh(draw, val, lay["value_font"])
+        val_x = int(center_x - val_w // 2)
+        val_y = int(icon_y + ico.height + lay["gap_icon_value"])
+        draw.text((val_x, val_y), val, font=lay["value_font"], fill=(255, 255, 255))
+
+    # ---------- SAVE ----------
+    # Write then rename: output_path may be a photo hard-linked with another
+    # listing (see photo_dedupe.py) and must not be overwritten in place
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f"{root}.part{ext}"
+    new_img.save(tmp_path)
+    os.replace(tmp_path, output_path)
+    print(f"[SUCCESS] Collage created and saved at: {output_path}")
+
+    return {
+        "output": output_path,
+        "source_size": source_size,
+        "photo_size": (original_width, original_height),
+        "output_size": new_img.size,
+        "peak_pixel_mb": estimate / 2**20,
+    }
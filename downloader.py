@@ -0,0 +1,148 @@
+"""
+Download stage: fetch a listing's gallery photos into its folder.
+
+Rightmove media URLs usually carry a size token before the extension
+(".../IMG_00_0000_max_656x437.jpeg"). Only the collage photo needs full
+resolution, so every other photo is fetched at SMALL_VARIANT by rewriting that
+token, and the hero photo is fetched separately with the token removed. URLs
+without a token, or whose rewritten variant can't be fetched, fall back to the
+URL exactly as the gallery served it.
+"""
+import os
+import re
+
+import requests
+
+from listing_store import COLLAGE_FILENAME, SOURCE_FILENAME, copy_photo
+
+# ========== CONFIG ==========
+SMALL_VARIANT = (296, 197)   # sheet thumbnails are 180x120; this leaves room for dedupe/hero scoring
+REPORT_SAVINGS = False       # True: one extra HEAD per photo to compare against the gallery-size URLs
+# ===========================
+
+_SIZE_TOKEN_RE = re.compile(r"_max_(\d+)x(\d+)(?=\.[A-Za-z]+(?:$|\?))")
+
+
+def variant_url(url, size=None):
+    """
+    Rewrite the media URL's size token.
+
+    size=(w, h) asks for that variant, size=None for the full-size original.
+    URLs without a size token are returned unchanged.
+    """
+    if not _SIZE_TOKEN_RE.search(url):
+        return url
+    if size is None:
+        return _SIZE_TOKEN_RE.sub("", url, count=1)
+    return _SIZE_TOKEN_RE.sub(f"_max_{size[0]}x{size[1]}", url, count=1)
+
+
+def _save(content, file_path):
+    # Write then rename: the old file may be a hard link shared with
+    # another listing (see photo_dedupe.py) and must not be overwritten in place
+    tmp_path = file_path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, file_path)
+
+
+def _fetch(session, url, wanted_url):
+    """GET wanted_url, falling back to url if the variant isn't served. Returns the response or None."""
+    if wanted_url != url:
+        try:
+            response = session.get(wanted_url)
+            if response.status_code == 200:
+                return response
+            print(f"[WARN] Variant not available ({response.status_code}), using original: {url}")
+        except Exception as e:
+            print(f"[WARN] Variant request failed ({e}), using original: {url}")
+    response = session.get(url)
+    if response.status_code == 200:
+        return response
+    print(f"[ERROR] Failed to download: {url} (Status code: {response.status_code})")
+    return None
+
+
+def _original_size(session, url):
+    try:
+        response = session.head(url, allow_redirects=True)
+        return int(response.headers.get("Content-Length", 0)) if response.status_code == 200 else 0
+    except Exception:
+        return 0
+
+
+def download_images(img_urls, download_folder, size=SMALL_VARIANT):
+    """
+    Save img_urls as image_1.jpg, image_2.jpg, ... at the `size` variant.
+
+    Returns a report dict with bytes downloaded and, when REPORT_SAVINGS is
+    on, the bytes the URLs as served by the gallery would have cost.
+    """
+    downloaded = gallery = 0
+    with requests.Session() as session:
+        for idx, url in enumerate(img_urls):
+            wanted_url = variant_url(url, size)
+            try:
+                print(f"[INFO] Downloading image {idx + 1}: {wanted_url}")
+                response = _fetch(session, url, wanted_url)
+                if response is None:
+                    continue
+                file_path = os.path.join(download_folder, f"image_{idx + 1}.jpg")
+                _save(response.content, file_path)
+                downloaded += len(response.content)
+                if REPORT_SAVINGS:
+                    original = _original_size(session, url) if response.url != url else 0
+                    gallery += original or len(response.content)
+                print(f"[SUCCESS] Saved to: {file_path}")
+            except Exception as e:
+                print(f"[EXCEPTION] Error downloading {url}: {e}")
+
+    print(f"[INFO] Downloaded {downloaded / 1024:.0f} KB for {len(img_urls)} photo(s) at the small variant")
+    return {"bytes_downloaded": downloaded, "bytes_gallery": gallery}
+
+
+def download_hero(img_urls, download_folder, index=0):
+    """
+    Fetch the full-size variant of img_urls[index] into image_1.jpg and source_1.jpg.
+
+    source_1.jpg is an untouched copy kept so banner-only changes can be
+    re-rendered later without downloading anything. Returns bytes downloaded.
+    """
+    if not img_urls or index >= len(img_urls):
+        print("[WARN] No hero photo to download.")
+        return 0
+    url = img_urls[index]
+    wanted_url = variant_url(url, None)
+    print(f"[INFO] Downloading full-size hero photo: {wanted_url}")
+    with requests.Session() as session:
+        response = _fetch(session, url, wanted_url)
+    if response is None:
+        return 0
+    collage_path = os.path.join(download_folder, COLLAGE_FILENAME)
+    _save(response.content, collage_path)
+    copy_photo(collage_path, os.path.join(download_folder, SOURCE_FILENAME))
+    print(f"[SUCCESS] Saved to: {collage_path} ({len(response.content) / 1024:.0f} KB)")
+    return len(response.content)
+
+
+def report_listing_bytes(download_report, hero_bytes):
+    """
+    Log what the listing cost against fetching every gallery URL as served.
+
+    The total counts every small variant (including the one the full-size
+    hero replaced) plus the hero, so the net figure can be negative.
+    """
+    total = download_report["bytes_downloaded"] + hero_bytes
+    report = dict(download_report, bytes_hero=hero_bytes, bytes_total=total)
+    gallery = download_report.get("bytes_gallery")
+    if not gallery:
+        print(f"[INFO] Listing download: {total / 1024:.0f} KB "
+              f"({download_report['bytes_downloaded'] / 1024:.0f} KB photos + {hero_bytes / 1024:.0f} KB hero)")
+        return report
+    net = gallery - total
+    report["bytes_saved"] = net
+    print(f"[INFO] Listing download: {total / 1024:.0f} KB "
+          f"({download_report['bytes_downloaded'] / 1024:.0f} KB photos + {hero_bytes / 1024:.0f} KB hero) "
+          f"vs {gallery / 1024:.0f} KB for the gallery-size URLs -> "
+          + (f"{net / 1024:.0f} KB saved" if net >= 0 else f"{-net / 1024:.0f} KB more"))
+    return report
@@ -0,0 +1,81 @@
+"""
+Change detection for re-scraped listings.
+
+A listing's fingerprint is split into three hashes so a refresh can do the
+least work needed:
+
+* images  - the ordered list of gallery image URLs
+* banner  - everything drawn on the collage banner (price, address, stats)
+* details - everything else we save as text (the full description)
+
+The last fingerprint is stored as fingerprint.json in the listing folder.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+FINGERPRINT_FILENAME = "fingerprint.json"
+
+BANNER_FIELDS = ("price", "address", "house_type", "bedrooms", "bathrooms", "size_sqft")
+DETAIL_FIELDS = ("description",)
+
+# Return values of compare(), from cheapest to most expensive refresh
+UNCHANGED = "unchanged"          # nothing to do
+DETAILS_CHANGED = "details"      # rewrite text files only
+BANNER_CHANGED = "banner"        # re-render the banner from the cached source photo
+IMAGES_CHANGED = "images"        # full download + render
+
+
+def _digest(values: List[str]) -> str:
+    h = hashlib.sha256()
+    for v in values:
+        h.update((v or "").strip().encode("utf-8"))
+        h.update(b"\x1f")  # separator so ("ab", "c") != ("a", "bc")
+    return h.hexdigest()
+
+
+def compute(fields: Dict[str, str], image_urls: List[str]) -> Dict:
+    """Build a fingerprint from the extracted fields and gallery image URLs."""
+    return {
+        "images": _digest(image_urls),
+        "banner": _digest([fields.get(k, "") for k in BANNER_FIELDS]),
+        "details": _digest([fields.get(k, "") for k in DETAIL_FIELDS]),
+        "fields": {k: fields.get(k, "") for k in BANNER_FIELDS + DETAIL_FIELDS},
+        "image_urls": list(image_urls),
+        "checked_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def load(folder: str) -> Optional[Dict]:
+    path = os.path.join(folder, FINGERPRINT_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[WARN] Could not read previous fingerprint {path}: {e}")
+        return None
+
+
+def save(folder: str, fingerprint: Dict) -> None:
+    path = os.path.join(folder, FINGERPRINT_FILENAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(fingerprint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def compare(previous: Optional[Dict], current: Dict) -> str:
+    """Return the most expensive kind of change between two fingerprints."""
+    if not previous:
+        return IMAGES_CHANGED
+    if previous.get("images") != current["images"]:
+        return IMAGES_CHANGED
+    if previous.get("banner") != current["banner"]:
+        return BANNER_CHANGED
+    if previous.get("details") != current["details"]:
+        return DETAILS_CHANGED
+    return UNCHANGED
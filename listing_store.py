@@ -0,0 +1,127 @@
+"""
+Per-listing folder layout shared by all stages.
+
+The scrape stage saves everything it extracted to listing.json, so download,
+render and refresh can run later (or on another worker) without re-scraping.
+Standard library only, so every stage can import it cheaply.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+
+BASE_FOLDER = "rightmove_images"
+LISTING_FILENAME = "listing.json"
+INFO_FILENAME = "property_info.txt"
+DESCRIPTION_FILENAME = "description.txt"
+SOURCE_FILENAME = "source_1.jpg"   # untouched first photo, kept for re-renders
+COLLAGE_FILENAME = "image_1.jpg"   # final collage (overwrites first photo)
+
+_PROPERTY_ID_RE = re.compile(r"/properties/(\d+)")
+
+
+def new_numbered_folder(base_folder=BASE_FOLDER):
+    """Create a new numbered subfolder (1, 2, 3, ...) and return its path."""
+    os.makedirs(base_folder, exist_ok=True)
+    existing_subfolders = [
+        d for d in os.listdir(base_folder)
+        if os.path.isdir(os.path.join(base_folder, d)) and d.isdigit()
+    ]
+    if existing_subfolders:
+        new_folder_number = max(int(d) for d in existing_subfolders) + 1
+    else:
+        new_folder_number = 1
+    download_folder = os.path.join(base_folder, str(new_folder_number))
+    os.makedirs(download_folder, exist_ok=True)
+    return download_folder
+
+
+def listing_id(url):
+    """
+    Stable folder name for a listing URL.
+
+    Rightmove property URLs carry a numeric ID (/properties/165123314), which
+    becomes "rm_165123314" regardless of query string or #fragment. Anything
+    else falls back to a short hash of the trimmed URL. The prefix keeps these
+    folders apart from the plain numbered folders new_numbered_folder creates.
+    """
+    url = url.strip()
+    m = _PROPERTY_ID_RE.search(url)
+    if m:
+        return f"rm_{m.group(1)}"
+    return "url_" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+
+def resolve_folder(folder, base_folder=BASE_FOLDER):
+    """Accept either a folder path or a bare folder name under rightmove_images/."""
+    if os.path.isdir(folder) or os.sep in folder or "/" in folder:
+        return folder
+    return os.path.join(base_folder, folder)
+
+
+def photo_paths(download_folder):
+    """image_1.jpg, image_2.jpg, ... present in the folder, in numeric order."""
+    names = [f for f in os.listdir(download_folder)
+             if f.startswith("image_") and f.endswith(".jpg") and f[6:-4].isdigit()]
+    return [os.path.join(download_folder, f) for f in sorted(names, key=lambda f: int(f[6:-4]))]
+
+
+def copy_photo(src, dst):
+    """
+    Copy src to dst through a temporary file and a rename.
+
+    dst may be a hard link shared with another listing (see photo_dedupe.py),
+    so it is replaced rather than overwritten in place.
+    """
+    tmp = dst + ".part"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def clear_photos(download_folder):
+    """
+    Delete the downloaded photos before a full re-download.
+
+    Otherwise a gallery that shrank leaves image_N.jpg files from the previous
+    run behind, which dedupe would then score as if they were current. Only
+    this folder's names are unlinked, so photos hard-linked from other
+    listings are unaffected.
+    """
+    removed = 0
+    for path in photo_paths(download_folder):
+        os.remove(path)
+        removed += 1
+    if removed:
+        print(f"[INFO] Removed {removed} photo(s) from the previous download.")
+    return removed
+
+
+def save_listing(download_folder, listing):
+    path = os.path.join(download_folder, LISTING_FILENAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(listing, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_listing(download_folder):
+    path = os.path.join(download_folder, LISTING_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {LISTING_FILENAME} in {download_folder}; run the scrape stage first.")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_text_files(download_folder, listing):
+    """Write property_info.txt (read by the sheet builder) and description.txt."""
+    info_file = os.path.join(download_folder, INFO_FILENAME)
+    with open(info_file, "w", encoding="utf-8") as f:
+        f.write(f"Address: {listing['address']}\n")
+        f.write(f"Price: {listing['price']}\n")
+    print(f"[DONE] Scraped and saved all data to '{download_folder}' ✅")
+
+    description_file = os.path.join(download_folder, DESCRIPTION_FILENAME)
+    with open(description_file, "w", encoding="utf-8") as f:
+        f.write(listing["description"])
+    print(f"[INFO] Full description saved to: {description_file}")
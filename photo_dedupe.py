@@ -0,0 +1,342 @@
+"""
+Photo stage: perceptual-hash dedupe and hero image selection.
+
+Rightmove often serves the same photo twice (different sizes, or two near
+identical shots). After download, this stage
+
+* hashes every photo (DCT perceptual hash, computed for the whole listing at
+  once with NumPy from reduced-size JPEG decodes),
+* deletes near-duplicates inside the listing, keeping the most detailed copy,
+* hard-links photos that are near-duplicates of one already in another listing
+  folder, so the cache stores them once (hashes live in a small SQLite index so
+  parallel workers can update it safely),
+* ranks the remaining photos on sharpness, brightness and gallery position and
+  moves the best one to image_1.jpg / source_1.jpg for the collage.
+
+Every photo is downloaded at the same small variant (see downloader.py) and
+only the hero is fetched full size afterwards, so pixel dimensions say nothing
+about the originals and are not part of the score.
+"""
+import os
+import sqlite3
+import time
+
+import numpy as np
+from PIL import Image
+
+from listing_store import COLLAGE_FILENAME, SOURCE_FILENAME, copy_photo, photo_paths
+
+# ========== CONFIG ==========
+DECODE_SIZE = 64             # photos are decoded and resized to DECODE_SIZE x DECODE_SIZE grayscale
+HASH_SIZE = 8                # 8x8 low-frequency DCT block -> 64-bit hash
+NEAR_DUPLICATE_BITS = 6      # max Hamming distance for two photos to count as the same shot
+CACHE_INDEX_FILENAME = "phash_index.sqlite3"
+
+# Hero score weights (each term is scaled to 0..1 within the listing)
+HERO_WEIGHTS = {
+    "sharpness": 0.45,
+    "brightness": 0.30,
+    "position": 0.25,        # agents usually put the front of the house first
+}
+# ===========================
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0, :] = np.sqrt(1.0 / n)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(DECODE_SIZE // 2)
+
+
+def decode_small(path, size=DECODE_SIZE):
+    """
+    Return (size x size float32 grayscale array, (full width, full height)).
+
+    draft() lets the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding, so
+    a large photo is never expanded to full resolution just to be hashed.
+    """
+    with Image.open(path) as im:
+        full_size = im.size
+        im.draft("L", (size, size))
+        small = im.convert("L").resize((size, size), Image.BILINEAR)
+        return np.asarray(small, dtype=np.float32), full_size
+
+
+def phash(gray):
+    """
+    Perceptual hashes for a stack of grayscale images, shape (N, DECODE_SIZE, DECODE_SIZE).
+
+    Returns an (N,) uint64 array.
+    """
+    n, s, _ = gray.shape
+    half = s // 2
+    small = gray.reshape(n, half, 2, half, 2).mean(axis=(2, 4))
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT, small, _DCT)[:, :HASH_SIZE, :HASH_SIZE]
+    flat = coeffs.reshape(n, -1)
+    # Median over the block without the DC term, which only reflects overall brightness
+    median = np.median(flat[:, 1:], axis=1, keepdims=True)
+    bits = flat > median
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def hamming(a, b):
+    """Pairwise Hamming distances between two uint64 hash arrays, shape (len(a), len(b))."""
+    x = np.bitwise_xor(a[:, None], b[None, :])
+    return _POPCOUNT[x.view(np.uint8).reshape(x.shape + (8,))].sum(axis=-1, dtype=np.int32)
+
+
+def hero_scores(gray):
+    """Score photos for the collage from their reduced decodes."""
+    n = gray.shape[0]
+
+    # Variance of the Laplacian: higher means more edges in focus
+    lap = (-4 * gray[:, 1:-1, 1:-1] + gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1]
+           + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:])
+    sharp = lap.reshape(n, -1).var(axis=1)
+    sharpness = sharp / sharp.max() if sharp.max() > 0 else np.zeros(n)
+
+    # 1.0 for a mid-grey average, 0.0 for an all-black or all-white photo
+    brightness = 1.0 - 2.0 * np.abs(gray.reshape(n, -1).mean(axis=1) / 255.0 - 0.5)
+
+    position = 1.0 - np.arange(n) / max(n - 1, 1)
+
+    return (HERO_WEIGHTS["sharpness"] * sharpness
+            + HERO_WEIGHTS["brightness"] * brightness
+            + HERO_WEIGHTS["position"] * position)
+
+
+def _cluster(dist, threshold):
+    """Group indices whose distance is within threshold (union-find)."""
+    parent = list(range(dist.shape[0]))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(dist <= threshold, k=1))):
+        parent[find(i)] = find(j)
+    groups = {}
+    for i in range(len(parent)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+# ----- Cross-listing cache index -----
+# Each 64-bit hash is split into HASH_BANDS bands of 8 bits. Two hashes within
+# NEAR_DUPLICATE_BITS of each other differ in at most that many bands, so they
+# share at least HASH_BANDS - NEAR_DUPLICATE_BITS bands (2 with the defaults).
+# Looking candidates up by band value therefore finds every near-duplicate
+# while only touching rows that share bands, not the whole index.
+# (NEAR_DUPLICATE_BITS must stay below HASH_BANDS for that guarantee.)
+HASH_BANDS = 8
+_MIN_SHARED_BANDS = max(1, HASH_BANDS - NEAR_DUPLICATE_BITS)
+_INDEX_VERSION = 2
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    id      INTEGER PRIMARY KEY,
+    path    TEXT NOT NULL UNIQUE,   -- relative to the base folder
+    listing TEXT NOT NULL,          -- listing folder, relative to the base folder
+    hash    INTEGER NOT NULL        -- 64-bit pHash, stored as a signed integer
+);
+CREATE INDEX IF NOT EXISTS photos_listing_idx ON photos (listing);
+CREATE TABLE IF NOT EXISTS photo_bands (
+    key      INTEGER NOT NULL,      -- band number << 8 | band value
+    photo_id INTEGER NOT NULL,
+    PRIMARY KEY (key, photo_id)
+) WITHOUT ROWID;
+"""
+
+_CANDIDATES_SQL = (
+    "SELECT p.path, p.hash FROM photos p JOIN ("
+    "SELECT photo_id FROM photo_bands WHERE key IN ({}) "
+    "GROUP BY photo_id HAVING COUNT(*) >= ?"
+    ") c ON p.id = c.photo_id WHERE p.listing != ?"
+).format(", ".join("?" * HASH_BANDS))
+
+
+def _band_keys(h):
+    return [(band << 8) | ((h >> (8 * band)) & 0xFF) for band in range(HASH_BANDS)]
+
+
+def _to_signed(h):
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def _open_index(base_folder):
+    conn = sqlite3.connect(os.path.join(base_folder, CACHE_INDEX_FILENAME), timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != _INDEX_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != _INDEX_VERSION:
+            # Older layout (hex hashes, no bands): start over; the index refills
+            # as listings are deduped again
+            conn.execute("DROP TABLE IF EXISTS photo_bands")
+            conn.execute("DROP TABLE IF EXISTS photos")
+            for statement in _INDEX_SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {_INDEX_VERSION}")
+        conn.execute("COMMIT")
+    return conn
+
+
+def _find_cache_matches(conn, folder_rel, query_hashes):
+    """For each hash, the indexed path of its closest near-duplicate in another listing, or None."""
+    matches = []
+    for h in query_hashes:
+        rows = conn.execute(_CANDIDATES_SQL, (*_band_keys(h), _MIN_SHARED_BANDS, folder_rel)).fetchall()
+        if not rows:
+            matches.append(None)
+            continue
+        candidates = np.array([v for _, v in rows], dtype=np.int64).view(np.uint64)
+        dist = hamming(np.array([h], dtype=np.uint64), candidates)[0]
+        j = int(np.argmin(dist))
+        matches.append(rows[j][0] if dist[j] <= NEAR_DUPLICATE_BITS else None)
+    return matches
+
+
+def _replace_listing(conn, folder_rel, entries):
+    """Swap the index rows for one listing for entries [(path, hash), ...]; call inside a transaction."""
+    old = conn.execute("SELECT id, hash FROM photos WHERE listing = ?", (folder_rel,)).fetchall()
+    conn.executemany("DELETE FROM photo_bands WHERE key = ? AND photo_id = ?",
+                     [(key, photo_id) for photo_id, h in old for key in _band_keys(h & 0xFFFFFFFFFFFFFFFF)])
+    conn.execute("DELETE FROM photos WHERE listing = ?", (folder_rel,))
+    for path, h in entries:
+        cur = conn.execute("INSERT OR REPLACE INTO photos (path, listing, hash) VALUES (?, ?, ?)",
+                           (path, folder_rel, _to_signed(h)))
+        conn.executemany("INSERT OR IGNORE INTO photo_bands (key, photo_id) VALUES (?, ?)",
+                         [(key, cur.lastrowid) for key in _band_keys(h)])
+
+
+def _link_to(canonical, path):
+    """Replace path with a hard link to canonical. Returns bytes saved (0 if linking isn't possible)."""
+    try:
+        if os.path.samefile(canonical, path):
+            return 0
+        size = os.path.getsize(path)
+        tmp = path + ".link"
+        os.link(canonical, tmp)
+        os.replace(tmp, path)
+        return size
+    except OSError:
+        return 0
+
+
+def dedupe_listing(download_folder, base_folder=None):
+    """
+    Run dedupe + hero selection on a downloaded listing folder and return a summary dict.
+
+    base_folder holds the cross-listing hash index and defaults to the folder
+    the listing folder sits in (normally rightmove_images/).
+    """
+    start = time.perf_counter()
+    if base_folder is None:
+        base_folder = os.path.dirname(os.path.abspath(download_folder))
+    photos = photo_paths(download_folder)
+    if not photos:
+        print(f"[WARN] No photos to dedupe in {download_folder}")
+        return {"photos": 0, "removed": 0, "linked": 0, "bytes_saved": 0, "hero": None}
+
+    grays, sizes, readable = [], [], []
+    for p in photos:
+        try:
+            g, size = decode_small(p)
+        except Exception as e:
+            print(f"[WARN] Could not read {p}: {e}")
+            continue
+        grays.append(g)
+        sizes.append(size)
+        readable.append(p)
+    photos = readable
+    if not photos:
+        return {"photos": 0, "removed": 0, "linked": 0, "bytes_saved": 0, "hero": None}
+    gray = np.stack(grays)
+    hashes = phash(gray)
+
+    # --- Near-duplicates inside the listing: keep the largest copy ---
+    # Copies of the same variant have the same dimensions, so the file size
+    # (more JPEG detail) breaks the tie, then gallery order.
+    bytes_saved = 0
+    keep = []
+    file_sizes = [os.path.getsize(p) for p in photos]
+    for group in _cluster(hamming(hashes, hashes), NEAR_DUPLICATE_BITS):
+        best = max(group, key=lambda i: (sizes[i][0] * sizes[i][1], file_sizes[i], -i))
+        keep.append(best)
+        for i in group:
+            if i != best:
+                bytes_saved += file_sizes[i]
+                os.remove(photos[i])
+                print(f"[INFO] Removed near-duplicate {os.path.basename(photos[i])} "
+                      f"(same shot as {os.path.basename(photos[best])})")
+    keep.sort()
+    removed = len(photos) - len(keep)
+
+    # --- Hero selection among the survivors ---
+    scores = hero_scores(gray[keep])
+    hero = keep[int(np.argmax(scores))]
+    hero_path = photos[hero]
+    first_path = os.path.join(download_folder, COLLAGE_FILENAME)
+    if hero_path != first_path:
+        survivors = [photos[i] for i in keep]
+        if first_path in survivors:
+            # Swap so the hero becomes image_1.jpg and nothing is lost
+            first = photos.index(first_path)
+            tmp = first_path + ".swap"
+            os.replace(first_path, tmp)
+            os.replace(hero_path, first_path)
+            os.replace(tmp, hero_path)
+            photos[first], photos[hero] = photos[hero], photos[first]
+        else:
+            # image_1.jpg is missing, unreadable or a removed duplicate: the hero replaces it
+            os.replace(hero_path, first_path)
+            photos[hero] = first_path
+        print(f"[INFO] Hero image: {os.path.basename(hero_path)} -> {COLLAGE_FILENAME}")
+    source_path = os.path.join(download_folder, SOURCE_FILENAME)
+    copy_photo(first_path, source_path)
+
+    # --- Near-duplicates of photos already in other listings: hard-link them ---
+    # Candidates are looked up before taking the write lock; only linking and
+    # replacing this listing's rows run inside BEGIN IMMEDIATE, so parallel
+    # workers never drop each other's entries and only queue for the short part.
+    folder_rel = os.path.relpath(download_folder, base_folder)
+    linkable = [i for i in keep if photos[i] != first_path]  # source_1.jpg stays a private copy
+    entries = [(os.path.relpath(source_path if photos[i] == first_path else photos[i], base_folder),
+                int(hashes[i])) for i in keep]
+    linked = 0
+    conn = _open_index(base_folder)
+    try:
+        matches = _find_cache_matches(conn, folder_rel, [int(hashes[i]) for i in linkable])
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for i, match in zip(linkable, matches):
+                if match is None:
+                    continue
+                canonical = os.path.join(base_folder, match)
+                if not os.path.exists(canonical):
+                    continue  # removed since the lookup
+                saved = _link_to(canonical, photos[i])
+                if saved:
+                    linked += 1
+                    bytes_saved += saved
+            _replace_listing(conn, folder_rel, entries)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] Dedupe: {len(photos)} photos, {removed} near-duplicate(s) removed, "
+          f"{linked} linked to the cache, {bytes_saved / 1024:.0f} KB saved in {elapsed:.2f}s")
+    return {"photos": len(photos), "removed": removed, "linked": linked,
+            "bytes_saved": bytes_saved, "hero": os.path.basename(hero_path)}
@@ -1,9 +1,9 @@
-import re
+import importlib.util
 import sys
 import time
 import shutil
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Optional, List
 
 from openpyxl import Workbook, load_workbook
 from openpyxl.drawing.image import Image as XLImage
@@ -11,15 +11,27 @@ from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
 from openpyxl.worksheet.table import Table, TableStyleInfo
 from PIL import Image
 
+# The sheet is a view over the bulk export in the project root
+BULK_EXPORT_PATH = Path(__file__).resolve().parent.parent / "bulk_export.py"
+
+
+def _load_bulk_export():
+    """Load bulk_export.py from the project root by path, reusing it if script.py already did."""
+    if "bulk_export" in sys.modules:
+        return sys.modules["bulk_export"]
+    spec = importlib.util.spec_from_file_location("bulk_export", BULK_EXPORT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+bulk_export = _load_bulk_export()
+
 
 # ========== CONFIG ==========
 ROOT = r"G:\My Drive\tiktok\rightmove\Rightmove-Image-Scraper\rightmove_images"
-LINKS_CANDIDATES = ["Links.txt", "links.txt"]   # one URL per line; new links appended at the bottom
 OUTPUT_XLSX = "rightmove_properties.xlsx"
 
-IMAGE_FILENAME = "image_1.jpg"
-INFO_FILENAME = "property_info.txt"
-
 THUMB_MAX_W = 180   # embedded image max width (px)
 THUMB_MAX_H = 120   # embedded image max height (px)
 
@@ -133,51 +145,6 @@ def collect_existing_links(ws):
     return existing
 
 
-def read_links_with_line_numbers(root: Path):
-    links_path = None
-    for name in LINKS_CANDIDATES:
-        p = root / name
-        if p.exists():
-            links_path = p
-            break
-    if not links_path:
-        print(f"Links file not found. Tried: {', '.join(LINKS_CANDIDATES)} in {root}", file=sys.stderr)
-        return []
-    out = []
-    with links_path.open("r", encoding="utf-8", errors="ignore") as f:
-        for idx, raw in enumerate(f, start=1):
-            out.append((idx, raw.rstrip("\n")))
-    return out
-
-
-def parse_property_info(info_path: Path) -> Tuple[Optional[str], Optional[str]]:
-    if not info_path.exists():
-        return None, None
-    location = None
-    price_text = None
-    with info_path.open("r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.strip()
-            low = line.lower()
-            if low.startswith("address:"):
-                location = line.split(":", 1)[1].strip()
-            elif low.startswith("price:"):
-                price_text = line.split(":", 1)[1].strip()
-    return location, price_text
-
-
-def parse_price_to_number(price_text: Optional[str]) -> Optional[float]:
-    if not price_text:
-        return None
-    cleaned = re.sub(r"[^\d.]", "", price_text)
-    if not cleaned:
-        return None
-    try:
-        return float(cleaned)
-    except ValueError:
-        return None
-
-
 def add_thumbnail(ws, img_path: Path, row: int, col_letter: str, thumbs: TempThumbManager):
     if not img_path.exists():
         return
@@ -249,46 +216,43 @@ def try_save_workbook(wb: Workbook, out_path: Path) -> Path:
         return alt_ts
 
 
-def main():
-    root = Path(ROOT)
+def main(root_dir: Optional[str] = None):
+    root = Path(root_dir or ROOT)
     if not root.exists():
         print(f"Root path not found: {root}", file=sys.stderr)
         sys.exit(1)
 
+    # Refresh the CSV export first (no Parquet, so pyarrow isn't imported);
+    # the sheet only adds thumbnails on top of it
+    export = bulk_export.export_listings(str(root), parquet=False)
+    if not export["rows"]:
+        print("No listings to process.")
+        sys.exit(0)
+
     out_path = root / OUTPUT_XLSX
     wb, ws = ensure_workbook(out_path)
     existing_links = collect_existing_links(ws)
 
-    lines = read_links_with_line_numbers(root)
-    if not lines:
-        print("No links to process.")
-        sys.exit(0)
-
     thumbs = TempThumbManager(root)
     rows_added = 0
 
     try:
-        for line_no, raw in lines:
-            link = (raw or "").strip()
-            folder = root / str(line_no)  # line 1 -> folder "1", etc.
+        for record in bulk_export.read_export_csv(export["csv"]):
+            link = (record["url"] or "").strip()
 
             if not link:
                 continue
             if link in existing_links:
                 continue
-            if not folder.exists():
-                print(f"Warning: missing folder for line {line_no}: {folder}", file=sys.stderr)
-                continue
-
-            info_path = folder / INFO_FILENAME
-            img_path = folder / IMAGE_FILENAME
 
-            location, price_text = parse_property_info(info_path)
-            price_num = parse_price_to_number(price_text)
+            location = record["address"]
+            price_text = record["price_text"]
+            price_num = record["price"]
+            img_path = Path(record["image_path"]) if record["image_path"] else root / record["folder"] / "image_1.jpg"
 
             next_row = ws.max_row + 1
             # Folder
-            ws.cell(row=next_row, column=1, value=str(line_no))
+            ws.cell(row=next_row, column=1, value=record["folder"])
 
             # Link (clickable)
             c_link = ws.cell(row=next_row, column=2, value=link)
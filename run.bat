@@ -1,5 +1,5 @@
 @echo off
-REM run_queue.bat: Processes links from a queue file and runs the Python script for each link.
+REM run_queue.bat: Processes links from a queue file with a single Python process.
 
 REM Check if queue.txt exists
 if not exist queue.txt (
@@ -8,12 +8,7 @@ if not exist queue.txt (
     exit /b 1
 )
 
-REM Loop through each line (URL) in queue.txt
-for /f "usebackq delims=" %%a in ("queue.txt") do (
-    echo [INFO] Processing URL: %%a
-    python script.py "%%a"
-    echo.
-)
+REM Runs the pipeline for each URL (line) in queue.txt
+python script.py batch queue.txt
 
-echo [INFO] All URLs processed.
 pause
@@ -0,0 +1,206 @@
+"""
+Scrape stage: open a Rightmove listing in Chrome and extract its fields.
+
+This is the only module that imports Selenium and BeautifulSoup, so stages
+that don't scrape (render, sheet, ...) never pay for those imports.
+"""
+import os
+import re
+
+from bs4 import BeautifulSoup
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# -------------------------------
+# === SCRAPING CONFIGURATION ===
+# -------------------------------
+chrome_driver_path = os.path.join(os.getcwd(), "chromedriver.exe")  # Adjust for your OS if needed
+
+CONSENT_BUTTON_XPATH = "/html/body/div[7]/div[2]/div/div/div[2]/div/div/button[2]"
+IMAGE_CLICK_XPATH = "/html/body/div[2]/main/div/article/div/div[1]/div[1]/section/div/a[1]"
+ADDRESS_XPATH = "/html/body/div[2]/main//h1[@itemprop='streetAddress']"
+DESCRIPTION_XPATH = "/html/body/div[2]/main/div/div[2]/div/article[3]/div[3]/div/div"
+
+# XPaths provided
+X_HOUSE_TYPE = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[1]/dd/span/p"
+X_BEDROOMS   = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[2]/dd/span/p"
+X_BATHROOMS  = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[3]/dd/span/p"
+X_SIZE_SQFT  = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[4]/dd/span/p[1]"
+
+
+def _chrome():
+    options = Options()
+    # Uncomment the next line to run headless
+    # options.add_argument("--headless")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+
+    service = Service(executable_path=chrome_driver_path)
+    return webdriver.Chrome(service=service, options=options)
+
+
+def grab_text(wait, xpath, label):
+    """Wait for an element, return its trimmed text with logging."""
+    try:
+        el = wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
+        txt = (el.text or "").strip()
+        if txt:
+            print(f"[INFO] {label}: {txt}")
+            return txt
+        else:
+            print(f"[WARN] {label} element found but empty.")
+            return "N/A"
+    except Exception as e:
+        print(f"[WARN] Could not extract {label}: {e}")
+        return "N/A"
+
+
+def open_listing(driver, rightmove_url):
+    """Load the listing page and dismiss the consent banner (best-effort)."""
+    print(f"[INFO] Opening Rightmove URL: {rightmove_url}")
+    driver.get(rightmove_url)
+
+    # --- Click the cookie consent (or similar) button ---
+    try:
+        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, CONSENT_BUTTON_XPATH)))
+        driver.find_element(By.XPATH, CONSENT_BUTTON_XPATH).click()
+        print("[INFO] Clicked the consent button.")
+    except Exception as e:
+        print(f"[WARN] Could not click the consent button: {e}")
+
+
+def fetch_gallery_html(driver):
+    """Open the gallery on the loaded listing page and return the page source."""
+    # --- Click the image to open the gallery ---
+    try:
+        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, IMAGE_CLICK_XPATH)))
+        driver.find_element(By.XPATH, IMAGE_CLICK_XPATH).click()
+        print("[INFO] Clicked the image link to open the gallery.")
+    except Exception as e:
+        print(f"[WARN] Could not click the image link: {e}")
+
+    # Wait for images to appear on the page
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "div[id^='media'] img"))
+        )
+    except Exception:
+        raise RuntimeError("Timeout waiting for images to load.")
+
+    print("[INFO] Page loaded. Parsing HTML...")
+    return driver.page_source
+
+
+def fetch_address_fallback(driver):
+    print("[WARN] Address not found via itemprop, trying XPath fallback...")
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, ADDRESS_XPATH))
+        )
+        address = driver.find_element(By.XPATH, ADDRESS_XPATH).text.strip()
+        print(f"[INFO] Address (via XPath fallback): {address}")
+        return address
+    except Exception as e:
+        print(f"[ERROR] Address not found via XPath either. {e}")
+        return "Not found"
+
+
+def fetch_description(driver):
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, DESCRIPTION_XPATH))
+        )
+        full_description = driver.find_element(By.XPATH, DESCRIPTION_XPATH).text.strip()
+        print("[INFO] Full description extracted successfully.")
+        return full_description
+    except Exception as e:
+        print(f"[ERROR] Full description not found. {e}")
+        return "Not found"
+
+
+def fetch_stats(driver):
+    """Return (house_type, bedrooms, bathrooms, size_sqft) as displayed on the listing."""
+    print("[INFO] Extracting property stats (type / beds / baths / size)...")
+    wait = WebDriverWait(driver, 10)
+
+    house_type = grab_text(wait, X_HOUSE_TYPE, "House type")
+    bedrooms   = grab_text(wait, X_BEDROOMS,   "Bedrooms")
+    bathrooms  = grab_text(wait, X_BATHROOMS,  "Bathrooms")
+    size_sqft  = grab_text(wait, X_SIZE_SQFT,  "Size (sqft)")
+    return house_type, bedrooms, bathrooms, size_sqft
+
+
+def parse_gallery_html(html):
+    """Return (address or None, price, img_urls) parsed from the gallery page source."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # --- Extract Address ---
+    address_tag = soup.find("h1", {"itemprop": "streetAddress"})
+    address = None
+    if address_tag:
+        address = address_tag.text.strip()
+        print(f"[INFO] Address (via itemprop): {address}")
+
+    # --- Extract Price ---
+    price_tag = soup.find("span", string=re.compile(r"£[\d,]+"))
+    price = price_tag.text.strip() if price_tag else "Not found"
+    print(f"[INFO] Price: {price}")
+
+    # --- Extract Image URLs ---
+    media_imgs = soup.select("div[id^='media'] img")
+    print(f"[DEBUG] Found {len(media_imgs)} <img> tags inside media divs")
+    img_urls = []
+    seen_urls = set()
+
+    for img in media_imgs:
+        src = img.get("src")
+        if src and "media.rightmove.co.uk" in src and src not in seen_urls:
+            img_urls.append(src)
+            seen_urls.add(src)
+            print(f"[INFO] Found image: {src}")
+        else:
+            print(f"[WARN] Skipped invalid or missing image src")
+
+    return address, price, img_urls
+
+
+def scrape_listing(rightmove_url):
+    """
+    Scrape every field the later stages need and return them as a listing dict.
+
+    Everything comes from one Chrome session and one page load: the text
+    fields are read from the listing page, then the gallery is opened for the
+    photo URLs. A refresh run pays for this single load before deciding
+    whether anything needs downloading.
+    """
+    driver = _chrome()
+    try:
+        open_listing(driver, rightmove_url)
+        # Text fields first, while the gallery overlay isn't covering the page
+        full_description = fetch_description(driver)
+        house_type, bedrooms, bathrooms, size_sqft = fetch_stats(driver)
+        html = fetch_gallery_html(driver)
+        address, price, img_urls = parse_gallery_html(html)
+        if address is None:
+            address = fetch_address_fallback(driver)
+    finally:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    return {
+        "url": rightmove_url,
+        "address": address,
+        "price": price,
+        "description": full_description,
+        "house_type": house_type,
+        "bedrooms": bedrooms,
+        "bathrooms": bathrooms,
+        "size_sqft": size_sqft,
+        "img_urls": img_urls,
+    }
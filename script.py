@@ -1,484 +1,340 @@
-from PIL import Image, ImageDraw, ImageFont
+"""
+Rightmove Image Scraper - command line entry point.
+
+    python script.py [URL] [FOLDER] [--refresh]        # full pipeline (same as "run")
+    python script.py run URL [FOLDER] [--refresh]
+    python script.py scrape URL [FOLDER]                # listing.json + text files
+    python script.py download FOLDER                    # photos from listing.json (small + full-size hero)
+    python script.py dedupe FOLDER                      # drop near-duplicates, pick the hero photo
+    python script.py render FOLDER                      # collage from source_1.jpg
+    python script.py export [--root DIR] [--no-parquet] # listings.csv / listings.parquet
+    python script.py sheet [--root DIR]                 # rebuild rightmove_properties.xlsx
+    python script.py batch [FILE] [--refresh]           # every URL in FILE (default queue.txt)
+
+Heavy dependencies (Selenium, BeautifulSoup, requests, Pillow, openpyxl) are
+imported only by the stage that needs them, so e.g. a render-only run never
+loads Selenium. Add --startup-report to see what each run imported and how
+long that took (a short -X importtime).
+"""
+import argparse
+import importlib
+import importlib.util
 import os
-import time
-import re
-import requests
 import sys
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+import time
+import traceback
 
-# -------------------------------
-# === HANDLE URL INPUT ===
-# -------------------------------
-if len(sys.argv) > 1:
-    rightmove_url = sys.argv[1]
-    print(f"[INFO] Using URL from command line: {rightmove_url}")
-else:
-    rightmove_url = input("Please enter the url: ")
+_T0 = time.perf_counter()
 
-# -------------------------------
-# === FOLDER SETUP ===
-# -------------------------------
-base_folder = "rightmove_images"
-os.makedirs(base_folder, exist_ok=True)
-
-# Create a new numbered subfolder each time
-existing_subfolders = [
-    d for d in os.listdir(base_folder)
-    if os.path.isdir(os.path.join(base_folder, d)) and d.isdigit()
-]
-if existing_subfolders:
-    new_folder_number = max(int(d) for d in existing_subfolders) + 1
-else:
-    new_folder_number = 1
-download_folder = os.path.join(base_folder, str(new_folder_number))
-os.makedirs(download_folder, exist_ok=True)
-print(f"[INFO] Using download folder: {download_folder}")
+import listing_fingerprint
+import listing_store
 
-# -------------------------------
-# === SCRAPING CONFIGURATION ===
-# -------------------------------
-chrome_driver_path = os.path.join(os.getcwd(), "chromedriver.exe")  # Adjust for your OS if needed
+SUBCOMMANDS = ("run", "scrape", "download", "dedupe", "render", "export", "sheet", "batch")
+SHEET_BUILDER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "rightmove_images", "build_rightmove_sheet_from_link.py")
 
-# -------------------------------
-# === SETUP SELENIUM & OPEN URL ===
-# -------------------------------
-options = Options()
-# Uncomment the next line to run headless
-# options.add_argument("--headless")
-options.add_argument("--window-size=1920,1080")
-options.add_argument("--disable-blink-features=AutomationControlled")
-
-service = Service(executable_path=chrome_driver_path)
-driver = webdriver.Chrome(service=service, options=options)
-
-print(f"[INFO] Opening Rightmove URL: {rightmove_url}")
-driver.get(rightmove_url)
-
-# --- Click the cookie consent (or similar) button ---
-try:
-    consent_button_xpath = "/html/body/div[7]/div[2]/div/div/div[2]/div/div/button[2]"
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, consent_button_xpath)))
-    driver.find_element(By.XPATH, consent_button_xpath).click()
-    print("[INFO] Clicked the consent button.")
-except Exception as e:
-    print(f"[WARN] Could not click the consent button: {e}")
-
-# --- Click the image to open the gallery ---
-try:
-    image_click_xpath = "/html/body/div[2]/main/div/article/div/div[1]/div[1]/section/div/a[1]"
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, image_click_xpath)))
-    driver.find_element(By.XPATH, image_click_xpath).click()
-    print("[INFO] Clicked the image link to open the gallery.")
-except Exception as e:
-    print(f"[WARN] Could not click the image link: {e}")
-
-# Wait for images to appear on the page
-try:
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, "div[id^='media'] img"))
-    )
-except Exception as e:
-    print("[ERROR] Timeout waiting for images to load.")
-    driver.quit()
-    exit()
-
-# Get the page source and close the browser
-html = driver.page_source
-driver.quit()
-print("[INFO] Page loaded. Parsing HTML...")
+# (module name, seconds) for every stage module loaded by _lazy()
+_import_times = []
 
-# -------------------------------
-# === PARSE THE HTML WITH BEAUTIFULSOUP ===
-# -------------------------------
-soup = BeautifulSoup(html, "html.parser")
-
-# --- Extract Address ---
-address_tag = soup.find("h1", {"itemprop": "streetAddress"})
-if address_tag:
-    address = address_tag.text.strip()
-    print(f"[INFO] Address (via itemprop): {address}")
-else:
-    print("[WARN] Address not found via itemprop, trying XPath fallback...")
-    try:
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.get(rightmove_url)
-        address_xpath = "/html/body/div[2]/main//h1[@itemprop='streetAddress']"
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, address_xpath))
-        )
-        address_elem = driver.find_element(By.XPATH, address_xpath)
-        address = address_elem.text.strip()
-        print(f"[INFO] Address (via XPath fallback): {address}")
-        driver.quit()
-    except Exception as e:
-        print(f"[ERROR] Address not found via XPath either. {e}")
-        address = "Not found"
-        driver.quit()
-
-# --- Extract Price ---
-price_tag = soup.find("span", string=re.compile(r"£[\d,]+"))
-price = price_tag.text.strip() if price_tag else "Not found"
-print(f"[INFO] Price: {price}")
-
-# --- Extract Image URLs ---
-media_imgs = soup.select("div[id^='media'] img")
-print(f"[DEBUG] Found {len(media_imgs)} <img> tags inside media divs")
-img_urls = []
-seen_urls = set()
-
-for img in media_imgs:
-    src = img.get("src")
-    if src and "media.rightmove.co.uk" in src and src not in seen_urls:
-        img_urls.append(src)
-        seen_urls.add(src)
-        print(f"[INFO] Found image: {src}")
-    else:
-        print(f"[WARN] Skipped invalid or missing image src")
 
-# -------------------------------
-# === DOWNLOAD IMAGES ===
-# -------------------------------
-for idx, url in enumerate(img_urls):
-    try:
-        print(f"[INFO] Downloading image {idx + 1}: {url}")
-        response = requests.get(url)
-        if response.status_code == 200:
-            file_path = os.path.join(download_folder, f"image_{idx + 1}.jpg")
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-            print(f"[SUCCESS] Saved to: {file_path}")
-        else:
-            print(f"[ERROR] Failed to download: {url} (Status code: {response.status_code})")
-    except Exception as e:
-        print(f"[EXCEPTION] Error downloading {url}: {e}")
+def _lazy(module_name):
+    """Import a stage module on first use and record how long it took."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _import_times.append((module_name, time.perf_counter() - start))
+    return module
 
-# --- Save Address and Price to a file ---
-info_file = os.path.join(download_folder, "property_info.txt")
-with open(info_file, "w", encoding="utf-8") as f:
-    f.write(f"Address: {address}\n")
-    f.write(f"Price: {price}\n")
-print(f"[DONE] Scraped and saved all data to '{download_folder}' ✅")
 
-# -------------------------------
-# === EXTRACT FULL DESCRIPTION ===
-# -------------------------------
-try:
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.get(rightmove_url)
-    # XPath to the full description as provided
-    description_xpath = "/html/body/div[2]/main/div/div[2]/div/article[3]/div[3]/div/div"
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.XPATH, description_xpath))
-    )
-    description_elem = driver.find_element(By.XPATH, description_xpath)
-    full_description = description_elem.text.strip()
-    driver.quit()
-    print("[INFO] Full description extracted successfully.")
-except Exception as e:
-    print(f"[ERROR] Full description not found. {e}")
-    full_description = "Not found"
-
-description_file = os.path.join(download_folder, "description.txt")
-with open(description_file, "w", encoding="utf-8") as f:
-    f.write(full_description)
-print(f"[INFO] Full description saved to: {description_file}")
+def _load_sheet_builder():
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location("build_rightmove_sheet_from_link", SHEET_BUILDER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _import_times.append(("build_rightmove_sheet_from_link", time.perf_counter() - start))
+    return module
 
-# -------------------------------
-# === CREATE COLLAGE WITH PIL ===
-# -------------------------------
-# Use the first downloaded image for the collage and replace it with the final image
-image_path = os.path.join(download_folder, "image_1.jpg")
-if not os.path.exists(image_path):
-    print(f"[ERROR] Image not found at {image_path}. Cannot create collage.")
-    exit()
-
-# Set the output path as the same as image_1.jpg to replace it with the collage
-output_path = image_path
-font_path = "arial.ttf"  # Update this path if needed
-
-# Load the original image and get its size
-img = Image.open(image_path).convert("RGB")
-original_width, original_height = img.size
-
-# Define banner height and create a new image with extra space for the banner
-banner_height = 350
-new_height = original_height + banner_height
-new_img = Image.new("RGB", (original_width, new_height), color=(0, 0, 0))
-new_img.paste(img, (0, 0))
-
-import textwrap
-
-# --- Draw wrapped text on banner (Pillow 10+ compatible) ---
-
-def _text_wh(draw, text, font):
-    # returns (width, height) using textbbox (works in Pillow 10+)
-    l, t, r, b = draw.textbbox((0, 0), text, font=font)
-    return r - l, b - t
-
-def _wrap_text_to_width(draw, text, font, max_width):
-    if not text:
-        return []
-    words, lines, line = text.split(), [], ""
-    for w in words:
-        test = w if not line else f"{line} {w}"
-        tw, _ = _text_wh(draw, test, font)
-        if tw <= max_width:
-            line = test
-        else:
-            if line:
-                lines.append(line)
-            line = w
-    if line:
-        lines.append(line)
-    return lines
-
-def _draw_wrapped_text(draw, text, font, max_width, x, y, line_spacing=10, fill=(255, 255, 255)):
-    lines = _wrap_text_to_width(draw, text, font, max_width)
-    # stable line height (accounts for ascenders/descenders)
-    _, line_h = _text_wh(draw, "Ay", font)
-    for i, line in enumerate(lines):
-        draw.text((x, y + i * (line_h + line_spacing)), line, font=font, fill=fill)
-    return y + len(lines) * (line_h + line_spacing)
-
-# --- draw price and address onto the banner ---
-
-draw = ImageDraw.Draw(new_img)
-title_font = ImageFont.truetype(font_path, size=80)
-subtitle_font = ImageFont.truetype(font_path, size=50)
-
-padding = 40
-text_y = original_height + padding
-max_text_width = original_width - 2 * padding
-line_spacing = 10
-
-# price (wrapped)
-text_y = _draw_wrapped_text(draw, price, title_font, max_text_width, padding, text_y, line_spacing)
-
-# small gap between price and address
-text_y += 10
-
-# address (wrapped)
-_draw_wrapped_text(draw, address, subtitle_font, max_text_width, padding, text_y, line_spacing)
-
-# Adding Icons
-
-from PIL import Image, ImageDraw, ImageFont, ImageOps
-
-# ---------- LOAD BASE ----------
-image_path = os.path.join(download_folder, "image_1.jpg")
-if not os.path.exists(image_path):
-    print(f"[ERROR] Image not found at {image_path}. Cannot create collage.")
-    exit()
-
-img = Image.open(image_path).convert("RGB")
-original_width, original_height = img.size
-
-font_path = "arial.ttf"  # adjust if needed
-title_font = ImageFont.truetype(font_path, size=80)
-subtitle_font = ImageFont.truetype(font_path, size=50)
-value_font = ImageFont.truetype(font_path, size=40)
-
-padding = 40
-line_spacing = 10
-gap_price_address = 10
-gap_text_icons = 30
-gap_icon_value = 6
-spacing_x = 70  # gap between icon clusters
-
-# ---------- TEXT WRAP HELPERS ----------
-def text_wh(draw, text, font):
-    l, t, r, b = draw.textbbox((0, 0), text, font=font)
-    return r - l, b - t
-
-def wrap_text_to_width(draw, text, font, max_w):
-    words, lines, cur = text.split(), [], ""
-    for w in words:
-        test = w if not cur else f"{cur} {w}"
-        wpx, _ = text_wh(draw, test, font)
-        if wpx <= max_w:
-            cur = test
-        else:
-            if cur: lines.append(cur)
-            cur = w
-    if cur: lines.append(cur)
-    return lines
-
-# ---------- MEASURE EVERYTHING FIRST ----------
-measure = Image.new("RGB", (original_width, 10), "black")
-m_draw = ImageDraw.Draw(measure)
-max_text_w = original_width - 2 * padding
-
-price_lines = wrap_text_to_width(m_draw, price, title_font, max_text_w)
-addr_lines  = wrap_text_to_width(m_draw, address, subtitle_font, max_text_w)
-
-_, title_h = text_wh(m_draw, "Ay", title_font)
-_, sub_h   = text_wh(m_draw, "Ay", subtitle_font)
-_, val_h   = text_wh(m_draw, "9999", value_font)
-
-text_block_h = (
-    len(price_lines) * (title_h + line_spacing) +
-    gap_price_address +
-    len(addr_lines)  * (sub_h + line_spacing)
-)
+
+def print_startup_report(command, ready_at, finished_at):
+    print("[STARTUP] ----------------------------------------", file=sys.stderr)
+    print(f"[STARTUP] command: {command}", file=sys.stderr)
+    print(f"[STARTUP] CLI ready in {(ready_at - _T0) * 1000:8.1f} ms", file=sys.stderr)
+    for name, seconds in _import_times:
+        print(f"[STARTUP] import {name:<32} {seconds * 1000:8.1f} ms", file=sys.stderr)
+    print(f"[STARTUP] total run time  {(finished_at - _T0) * 1000:8.1f} ms", file=sys.stderr)
+    print(f"[STARTUP] modules loaded: {len(sys.modules)}", file=sys.stderr)
 
 
 # -------------------------------
-# === SCRAPE ICON VALUES (type, beds, baths, sqft) ===
+# === STAGES ===
 # -------------------------------
-print("[INFO] Extracting property stats (type / beds / baths / size)...")
+def stage_scrape(rightmove_url, download_folder):
+    scraper = _lazy("scraper")
+    listing = scraper.scrape_listing(rightmove_url)
+    listing_store.save_listing(download_folder, listing)
+    return listing
+
+
+def stage_download(download_folder, listing):
+    """Download every photo at the small variant (the hero is fetched full size by stage_hero)."""
+    downloader = _lazy("downloader")
+    listing_store.clear_photos(download_folder)
+    return downloader.download_images(listing["img_urls"], download_folder)
+
+
+def stage_hero(download_folder, listing, dedupe_summary=None, download_report=None):
+    """
+    Fetch the hero photo (picked by dedupe, else the first one) at full size for the collage.
+
+    Given stage_download's report, logs the listing's net bytes including the
+    hero and returns the combined report; otherwise returns the hero's bytes.
+    """
+    downloader = _lazy("downloader")
+    hero_index = 0
+    if dedupe_summary and dedupe_summary.get("hero"):
+        hero_index = int(dedupe_summary["hero"][len("image_"):-len(".jpg")]) - 1
+    hero_bytes = downloader.download_hero(listing["img_urls"], download_folder, hero_index)
+    if download_report is None:
+        return hero_bytes
+    return downloader.report_listing_bytes(download_report, hero_bytes)
+
+
+def stage_dedupe(download_folder):
+    try:
+        photo_dedupe = _lazy("photo_dedupe")
+    except ImportError as e:
+        print(f"[WARN] Skipping photo dedupe ({e}); install numpy to enable it.")
+        return None
+    return photo_dedupe.dedupe_listing(download_folder)
+
+
+def stage_render(download_folder, listing, render_options=None):
+    """Render the collage; render_options may set max_dim and memory_budget_mb."""
+    collage = _lazy("collage")
+    source_path = os.path.join(download_folder, listing_store.SOURCE_FILENAME)
+    collage_path = os.path.join(download_folder, listing_store.COLLAGE_FILENAME)
+    return collage.render_collage(source_path, collage_path, listing, **(render_options or {}))
+
+
+def pick_folder(rightmove_url, folder=None, refresh=False):
+    if folder:
+        # A fixed folder name (e.g. the stable listing ID passed by work_queue.py)
+        download_folder = listing_store.resolve_folder(folder)
+    elif refresh:
+        # Refreshing needs the previous run's folder, so use the stable listing ID
+        download_folder = os.path.join(listing_store.BASE_FOLDER, listing_store.listing_id(rightmove_url))
+    else:
+        # Create a new numbered subfolder each time
+        download_folder = listing_store.new_numbered_folder()
+    os.makedirs(download_folder, exist_ok=True)
+    print(f"[INFO] Using download folder: {download_folder}")
+    return download_folder
+
+
+def run_pipeline(rightmove_url, folder=None, refresh=False, render_options=None):
+    """
+    Scrape, download and render one listing; with refresh, only redo what changed.
+
+    Returns the render report from collage.render_collage, or None if nothing was rendered.
+    """
+    download_folder = pick_folder(rightmove_url, folder, refresh)
+    listing = stage_scrape(rightmove_url, download_folder)
+
+    # -------------------------------
+    # === CHANGE DETECTION (REFRESH MODE) ===
+    # -------------------------------
+    source_path = os.path.join(download_folder, listing_store.SOURCE_FILENAME)
+    collage_path = os.path.join(download_folder, listing_store.COLLAGE_FILENAME)
+    current_fingerprint = listing_fingerprint.compute(listing, listing["img_urls"])
+
+    download_images = True
+    render_collage = True
+    if refresh:
+        previous_fingerprint = listing_fingerprint.load(download_folder)
+        change = listing_fingerprint.compare(previous_fingerprint, current_fingerprint)
+        have_cache = os.path.exists(source_path) and os.path.exists(collage_path)
+        if change != listing_fingerprint.IMAGES_CHANGED and not have_cache:
+            print("[WARN] Cached photos missing; doing a full refresh.")
+            change = listing_fingerprint.IMAGES_CHANGED
+        print(f"[INFO] Refresh check: {change}")
+
+        if change == listing_fingerprint.UNCHANGED:
+            listing_fingerprint.save(download_folder, current_fingerprint)
+            print(f"[DONE] Listing unchanged; skipped download and render for '{download_folder}'")
+            return None
+        if change in (listing_fingerprint.BANNER_CHANGED, listing_fingerprint.DETAILS_CHANGED):
+            download_images = False
+        if change == listing_fingerprint.DETAILS_CHANGED:
+            render_collage = False
+
+    if download_images:
+        download_report = stage_download(download_folder, listing)
+        stage_hero(download_folder, listing, stage_dedupe(download_folder), download_report)
+    listing_store.write_text_files(download_folder, listing)
+
+    report = None
+    if render_collage:
+        report = stage_render(download_folder, listing, render_options)
+    else:
+        print("[DONE] Only the description changed; collage left as is.")
 
-# XPaths provided
-X_HOUSE_TYPE = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[1]/dd/span/p"
-X_BEDROOMS   = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[2]/dd/span/p"
-X_BATHROOMS  = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[3]/dd/span/p"
-X_SIZE_SQFT  = r"/html/body/div[2]/main/div/div[2]/div/article[2]/dl/div[4]/dd/span/p[1]"
+    listing_fingerprint.save(download_folder, current_fingerprint)
+    return report
 
-def grab_text(wait, xpath, label):
-    """Wait for an element, return its trimmed text with logging."""
-    try:
-        el = wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
-        txt = (el.text or "").strip()
-        if txt:
-            print(f"[INFO] {label}: {txt}")
-            return txt
-        else:
-            print(f"[WARN] {label} element found but empty.")
-            return "N/A"
-    except Exception as e:
-        print(f"[WARN] Could not extract {label}: {e}")
-        return "N/A"
 
-# Open a lightweight, fresh driver just for these details
-stats_driver = webdriver.Chrome(service=service, options=options)
-try:
-    stats_driver.get(rightmove_url)
+def read_url_file(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return [line.strip() for line in f if line.strip()]
 
-    # If a consent banner appears again, try to dismiss (best-effort)
-    try:
-        consent_button_xpath = "/html/body/div[7]/div[2]/div/div/div[2]/div/div/button[2]"
-        WebDriverWait(stats_driver, 5).until(
-            EC.element_to_be_clickable((By.XPATH, consent_button_xpath))
-        ).click()
-        print("[INFO] (stats) Clicked consent button.")
-    except Exception:
-        pass  # no consent shown; continue
-
-    wait = WebDriverWait(stats_driver, 10)
-
-    house_type = grab_text(wait, X_HOUSE_TYPE, "House type")
-    bedrooms   = grab_text(wait, X_BEDROOMS,   "Bedrooms")
-    bathrooms  = grab_text(wait, X_BATHROOMS,  "Bathrooms")
-    size_sqft  = grab_text(wait, X_SIZE_SQFT,  "Size (sqft)")
-
-finally:
-    try:
-        stats_driver.quit()
-    except Exception:
-        pass
-
-# Optional: light normalization for numbers (keeps original fallback if not found)
-import re
-def extract_number(s, default="N/A"):
-    if not s: return default
-    m = re.search(r"\d[\d,\.]*", s)
-    return m.group(0) if m else default
-
-bedrooms_disp  = extract_number(bedrooms,  "N/A")
-bathrooms_disp = extract_number(bathrooms, "N/A")
-# size may be like "3,968 sq ft" already; keep as-is if contains "ft", else show number
-size_disp = size_sqft if ("ft" in size_sqft.lower() or "sqm" in size_sqft.lower() or "m²" in size_sqft.lower()) else extract_number(size_sqft, "N/A")
-
-# Type may be "Terraced", "Freehold", etc.—keep full text
-type_disp = house_type if house_type != "N/A" else "N/A"
-
-print(f"[INFO] Final stats -> Type: {type_disp} | Beds: {bedrooms_disp} | Baths: {bathrooms_disp} | Size: {size_disp}")
-
-
-
-# ---------- ICONS (PNG) ----------
-icon_paths = [
-    "icons/house.png",      # house type
-    "icons/bed.png",        # bedrooms
-    "icons/bathroom.png",   # bathrooms
-    "icons/floorplan.png"   # square feet
-]
-value_texts = [type_disp, bedrooms_disp, bathrooms_disp, size_disp]
-
-# slightly smaller icons
-target_icon_h = 64  # was 96
-side_padding = 40   # left/right padding for the row
-gap_icon_value = 8  # icon -> value
-# no spacing_x needed—using equal columns
-
-icons = []
-for pth in icon_paths:
-    ico = Image.open(pth).convert("RGBA")
-    # don't upscale -> avoids blur
-    t_h = min(target_icon_h, ico.height)
-    ico = ImageOps.contain(ico, (10_000, t_h), method=Image.LANCZOS)
-    icons.append(ico)
-
-# row height for banner sizing
-icons_row_h = max(i.size[1] for i in icons) + gap_icon_value + val_h
-
-# ---------- COMPUTE BANNER HEIGHT DYNAMICALLY ----------
-banner_height = (
-    padding +
-    text_block_h +
-    gap_text_icons +
-    icons_row_h +
-    padding
-)
-
-new_height = original_height + banner_height
-new_img = Image.new("RGB", (original_width, new_height), color=(0, 0, 0))
-new_img.paste(img, (0, 0))
-draw = ImageDraw.Draw(new_img)
-
-# ---------- DRAW TEXT ----------
-y = original_height + padding
-for line in price_lines:
-    draw.text((padding, y), line, font=title_font, fill=(255, 255, 255))
-    y += title_h + line_spacing
-
-y += gap_price_address
-for line in addr_lines:
-    draw.text((padding, y), line, font=subtitle_font, fill=(255, 255, 255))
-    y += sub_h + line_spacing
-
-# ---------- DRAW ICONS (EQUAL COLUMNS) + VALUES UNDER ----------
-y += gap_text_icons
-row_y = int(y)
-
-n = len(icons)
-inner_w = original_width - 2 * side_padding
-col_w = inner_w / n  # may be float; we center per-column
-
-for i, (ico, val) in enumerate(zip(icons, value_texts)):
-    # column center
-    center_x = int(side_padding + (i + 0.5) * col_w)
-
-    # icon centered in its column
-    icon_x = int(center_x - ico.width // 2)
-    icon_y = int(row_y)
-    new_img.paste(ico, (icon_x, icon_y), ico)
-
-    # value centered under icon
-    val_w, val_hh = text_wh(draw, val, value_font)
-    val_x = int(center_x - val_w // 2)
-    val_y = int(icon_y + ico.height + gap_icon_value)
-    draw.text((val_x, val_y), val, font=value_font, fill=(255, 255, 255))
-
-
-# ---------- SAVE ----------
-output_path = image_path  # overwrite image_1.jpg
-new_img.save(output_path)
-print(f"[SUCCESS] Collage created and saved at: {output_path}")
 
+# -------------------------------
+# === COMMAND LINE ===
+# -------------------------------
+def _render_options(args):
+    options = {}
+    if args.max_dim is not None:
+        options["max_dim"] = args.max_dim or None
+    if args.memory_budget_mb:
+        options["memory_budget_mb"] = args.memory_budget_mb
+    return options
+
+
+def _add_render_arguments(p):
+    p.add_argument("--max-dim", type=int, default=None,
+                   help="longest side of the collage photo in px (default: collage.MAX_OUTPUT_DIM, 0 = no limit)")
+    p.add_argument("--memory-budget-mb", type=int, default=None,
+                   help="shrink the collage photo further if a render would need more pixel memory than this")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Rightmove listing scraper and collage generator")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print import/startup timings to stderr when done")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="scrape, download and render one listing")
+    p_run.add_argument("url", nargs="?", help="listing URL (prompted for if omitted)")
+    p_run.add_argument("folder", nargs="?", help="output folder name or path (default: next numbered folder)")
+    p_run.add_argument("--refresh", action="store_true", help="only redo what changed since the last run")
+    _add_render_arguments(p_run)
+
+    p_scrape = sub.add_parser("scrape", help="scrape one listing to listing.json")
+    p_scrape.add_argument("url")
+    p_scrape.add_argument("folder", nargs="?")
+
+    p_download = sub.add_parser("download", help="download photos for a scraped listing")
+    p_download.add_argument("folder")
+
+    p_dedupe = sub.add_parser("dedupe", help="remove near-duplicate photos and pick the hero image")
+    p_dedupe.add_argument("folder")
+
+    p_render = sub.add_parser("render", help="render the collage for a downloaded listing")
+    p_render.add_argument("folder")
+    _add_render_arguments(p_render)
+
+    p_export = sub.add_parser("export", help="write all listings to CSV (and Parquet if pyarrow is installed)")
+    p_export.add_argument("--root", default=listing_store.BASE_FOLDER, help="folder holding the listing folders")
+    p_export.add_argument("--no-parquet", action="store_true", help="only write CSV")
+
+    p_sheet = sub.add_parser("sheet", help="update rightmove_properties.xlsx")
+    p_sheet.add_argument("--root", help="rightmove_images folder (default: ROOT in the sheet builder)")
+
+    p_batch = sub.add_parser("batch", help="run the pipeline for every URL in a file")
+    p_batch.add_argument("file", nargs="?", default="queue.txt")
+    p_batch.add_argument("--refresh", action="store_true")
+    _add_render_arguments(p_batch)
+    return parser
+
+
+def _normalize_argv(argv):
+    """Keep the old `script.py URL [FOLDER] [--refresh]` form working by routing it to `run`."""
+    positional = [a for a in argv if not a.startswith("-")]
+    if not positional or positional[0] not in SUBCOMMANDS:
+        if "-h" in argv or "--help" in argv:
+            return argv
+        flags = [a for a in argv if a == "--startup-report"]
+        rest = [a for a in argv if a != "--startup-report"]
+        return flags + ["run"] + rest
+    return argv
+
+
+def main(argv=None):
+    argv = _normalize_argv(sys.argv[1:] if argv is None else argv)
+    args = build_parser().parse_args(argv)
+    ready_at = time.perf_counter()
+
+    exit_code = 0
+    try:
+        if args.command == "run":
+            rightmove_url = args.url
+            if rightmove_url:
+                print(f"[INFO] Using URL from command line: {rightmove_url}")
+            else:
+                rightmove_url = input("Please enter the url: ")
+            run_pipeline(rightmove_url, args.folder, args.refresh, _render_options(args))
+
+        elif args.command == "scrape":
+            download_folder = pick_folder(args.url, args.folder)
+            listing = stage_scrape(args.url, download_folder)
+            listing_store.write_text_files(download_folder, listing)
+
+        elif args.command == "download":
+            download_folder = listing_store.resolve_folder(args.folder)
+            listing = listing_store.load_listing(download_folder)
+            stage_hero(download_folder, listing, download_report=stage_download(download_folder, listing))
+
+        elif args.command == "dedupe":
+            download_folder = listing_store.resolve_folder(args.folder)
+            summary = stage_dedupe(download_folder)
+            if summary and summary.get("hero") != listing_store.COLLAGE_FILENAME:
+                stage_hero(download_folder, listing_store.load_listing(download_folder), summary)
+
+        elif args.command == "render":
+            download_folder = listing_store.resolve_folder(args.folder)
+            stage_render(download_folder, listing_store.load_listing(download_folder), _render_options(args))
+
+        elif args.command == "export":
+            _lazy("bulk_export").export_listings(args.root, parquet=not args.no_parquet)
+
+        elif args.command == "sheet":
+            _load_sheet_builder().main(args.root)
+
+        elif args.command == "batch":
+            urls = read_url_file(args.file)
+            render_options = _render_options(args)
+            failed = 0
+            peak_pixel_mb = 0.0
+            peak_render_rss_mb = None
+            for rightmove_url in urls:
+                print(f"[INFO] Processing URL: {rightmove_url}")
+                try:
+                    report = run_pipeline(rightmove_url, refresh=args.refresh, render_options=render_options)
+                    if report:
+                        peak_pixel_mb = max(peak_pixel_mb, report["peak_pixel_mb"])
+                        if report.get("render_rss_mb") is not None:
+                            peak_render_rss_mb = max(peak_render_rss_mb or 0.0, report["render_rss_mb"])
+                except Exception as e:
+                    failed += 1
+                    print(f"[ERROR] {rightmove_url} failed: {e}")
+                print()
+            print(f"[INFO] All URLs processed. {len(urls) - failed} ok, {failed} failed.")
+            if peak_pixel_mb:
+                print(f"[INFO] Largest render needed ~{peak_pixel_mb:.1f} MB of pixel buffers"
+                      + (f" (+{peak_render_rss_mb:.0f} MB RSS measured)" if peak_render_rss_mb is not None else "")
+                      + "; size parallel workers against that plus the process baseline.")
+            exit_code = 1 if failed else 0
 
+    except Exception as e:
+        # The traceback is what work_queue.py keeps as the job's last_error
+        print(f"[ERROR] {e}")
+        print(traceback.format_exc(), end="")
+        exit_code = 1
+    finally:
+        if args.startup_report:
+            print_startup_report(args.command, ready_at, time.perf_counter())
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
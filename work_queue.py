@@ -0,0 +1,401 @@
+"""
+Durable, lease-based work queue for script.py.
+
+URLs live in a SQLite database instead of being read straight from
+queue.txt. Any number of worker processes claim a URL with a time-limited
+lease, heartbeat while script.py runs, and either mark it done or release it
+for a retry with back-off. No external broker is needed.
+
+The database uses WAL mode, which only works when every process runs on the
+same host. Workers on other hosts sharing the file over a network volume must
+all pass --shared-volume, which switches to a rollback journal; that in turn
+relies on the volume's file locking, which many network filesystems get wrong.
+
+Usage:
+    python work_queue.py enqueue queue.txt          # add URLs (one per line)
+    python work_queue.py enqueue "https://..."      # add a single URL
+    python work_queue.py work --workers 3           # run 3 local workers
+    python work_queue.py status                     # counts per status
+    python work_queue.py retry-failed               # put failed jobs back
+    python work_queue.py requeue-done               # schedule finished jobs again
+    python work_queue.py work --refresh             # only re-render what changed
+    python work_queue.py work --workers 4 --memory-budget-mb 150   # cap each render
+    python work_queue.py --shared-volume work       # database on a network share
+
+Each listing is written to rightmove_images/<listing id>/, where the ID is
+derived from the URL (see listing_store.listing_id), so re-running or
+retrying a URL always lands in the same folder no matter which worker picks
+it up.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from listing_store import listing_id
+
+
+# ========== CONFIG ==========
+QUEUE_DB = "work_queue.sqlite3"
+SCRIPT_PATH = Path(__file__).resolve().with_name("script.py")
+
+LEASE_SECONDS = 300          # a claimed job is handed to another worker if not renewed in time
+HEARTBEAT_SECONDS = 30       # how often a busy worker renews its lease
+MAX_ATTEMPTS = 3             # after this many failed runs a job is parked as "failed"
+RETRY_BACKOFF_SECONDS = 60   # first retry delay; doubles with every further attempt
+IDLE_POLL_SECONDS = 5        # sleep between polls when nothing is claimable
+JOURNAL_MODE_LOCAL = "WAL"       # every worker on this host
+JOURNAL_MODE_SHARED = "DELETE"   # database on a shared volume (WAL needs shared memory on one host)
+# ===========================
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            TEXT PRIMARY KEY,
+    url           TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    available_at  REAL NOT NULL,
+    last_error    TEXT,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, available_at);
+"""
+
+
+def connect(db_path: str = QUEUE_DB, shared_volume: bool = False) -> sqlite3.Connection:
+    """
+    Open the queue database with explicit transaction control.
+
+    WAL mode for local workers; a rollback journal when the file is shared
+    with workers on other hosts (all of them must pass shared_volume=True).
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    journal_mode = JOURNAL_MODE_SHARED if shared_volume else JOURNAL_MODE_LOCAL
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def enqueue(conn: sqlite3.Connection, urls: List[str]) -> int:
+    """Add URLs to the queue. URLs already queued (by listing ID) are left untouched."""
+    now = time.time()
+    added = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for url in urls:
+            url = url.strip()
+            if not url:
+                continue
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, url, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (listing_id(url), url, now, now, now),
+            )
+            added += cur.rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return added
+
+
+def claim(conn: sqlite3.Connection, owner: str, lease_seconds: int = LEASE_SECONDS,
+          max_attempts: int = MAX_ATTEMPTS) -> Optional[sqlite3.Row]:
+    """
+    Lease the next available job to `owner`, or return None if nothing is claimable.
+
+    Pending jobs whose back-off has elapsed are eligible, as are leased jobs
+    whose lease ran out (the worker holding them died or lost the volume).
+    An expired job that has already used max_attempts is parked as "failed"
+    instead, so a URL that keeps killing its worker is not retried forever.
+    BEGIN IMMEDIATE takes the write lock up front so two workers can never
+    claim the same row.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, "
+            "last_error = 'lease expired on attempt ' || attempts || ' (worker died?)', updated_at = ? "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (STATUS_FAILED, now, STATUS_LEASED, now, max_attempts),
+        )
+        row = conn.execute(
+            "SELECT id FROM jobs "
+            "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?) "
+            "ORDER BY available_at LIMIT 1",
+            (STATUS_PENDING, now, STATUS_LEASED, now),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, "
+            "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (STATUS_LEASED, owner, now + lease_seconds, now, row["id"]),
+        )
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        conn.execute("COMMIT")
+        return job
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def heartbeat(conn: sqlite3.Connection, job_id: str, owner: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+    """Extend the lease. Returns False if the lease was lost (expired and re-claimed elsewhere)."""
+    now = time.time()
+    cur = conn.execute(
+        "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+        "WHERE id = ? AND lease_owner = ? AND status = ?",
+        (now + lease_seconds, now, job_id, owner, STATUS_LEASED),
+    )
+    return cur.rowcount == 1
+
+
+def complete(conn: sqlite3.Connection, job_id: str, owner: str) -> bool:
+    """Mark a leased job as done."""
+    now = time.time()
+    cur = conn.execute(
+        "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, "
+        "last_error = NULL, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+        (STATUS_DONE, now, job_id, owner, STATUS_LEASED),
+    )
+    return cur.rowcount == 1
+
+
+def release(conn: sqlite3.Connection, job_id: str, owner: str, error: str,
+            max_attempts: int = MAX_ATTEMPTS, backoff_seconds: int = RETRY_BACKOFF_SECONDS) -> str:
+    """
+    Give a failed job back to the queue.
+
+    It becomes claimable again after an exponential back-off, or is parked as
+    "failed" once it has used up max_attempts. Returns the new status.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ? AND status = ?",
+            (job_id, owner, STATUS_LEASED),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return "lost"
+        attempts = row["attempts"]
+        if attempts >= max_attempts:
+            status, available_at = STATUS_FAILED, now
+        else:
+            status, available_at = STATUS_PENDING, now + backoff_seconds * (2 ** (attempts - 1))
+        conn.execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, "
+            "available_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+            (status, available_at, error[-2000:], now, job_id),
+        )
+        conn.execute("COMMIT")
+        return status
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def retry_failed(conn: sqlite3.Connection) -> int:
+    """Reset failed jobs to pending with a fresh attempt budget."""
+    now = time.time()
+    cur = conn.execute(
+        "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE status = ?",
+        (STATUS_PENDING, now, now, STATUS_FAILED),
+    )
+    return cur.rowcount
+
+
+def requeue_done(conn: sqlite3.Connection) -> int:
+    """Put finished jobs back in the queue, e.g. for a daily refresh pass."""
+    now = time.time()
+    cur = conn.execute(
+        "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE status = ?",
+        (STATUS_PENDING, now, now, STATUS_DONE),
+    )
+    return cur.rowcount
+
+
+def status_counts(conn: sqlite3.Connection) -> List[Tuple[str, int]]:
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status ORDER BY status").fetchall()
+    return [(r["status"], r["n"]) for r in rows]
+
+
+# ----- Worker -----
+def run_job(conn: sqlite3.Connection, job: sqlite3.Row, owner: str, refresh: bool = False,
+            render_args: Optional[List[str]] = None) -> Tuple[bool, str]:
+    """
+    Run script.py for one leased job, heartbeating until it exits.
+
+    render_args (e.g. ["--memory-budget-mb", "200"]) are passed on to
+    `script.py run`.
+
+    The child is killed if the lease is lost or heartbeating fails, so a job
+    is never processed by two live workers at once.
+    """
+    cmd = [sys.executable, str(SCRIPT_PATH), "run", job["url"], job["id"]]
+    if refresh:
+        cmd.append("--refresh")
+    cmd.extend(render_args or [])
+    # A piped stdout would otherwise use the locale encoding (cp1252 on
+    # Windows), and script.py's log lines include non-ASCII characters.
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    proc = subprocess.Popen(cmd, cwd=str(SCRIPT_PATH.parent), env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, encoding="utf-8", errors="replace")
+    output: List[str] = []
+    # Drain output on a thread so a chatty child never blocks on a full pipe.
+    reader = threading.Thread(target=lambda: output.extend(proc.stdout), daemon=True)
+    reader.start()
+    try:
+        while True:
+            try:
+                proc.wait(timeout=HEARTBEAT_SECONDS)
+                break
+            except subprocess.TimeoutExpired:
+                if not heartbeat(conn, job["id"], owner):
+                    print(f"[WARN] [{owner}] Lost lease on {job['id']}; stopping script.py.")
+                    return False, "lease lost"
+    finally:
+        # Never leave script.py running once this worker stops tracking it
+        # (lost lease, or heartbeat() raising e.g. "database is locked").
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        reader.join(timeout=5)
+    tail = "".join(output[-40:])
+    if proc.returncode == 0:
+        return True, tail
+    return False, f"script.py exited with code {proc.returncode}\n{tail}"
+
+
+def worker_loop(db_path: str, once: bool = False, refresh: bool = False,
+                shared_volume: bool = False, render_args: Optional[List[str]] = None) -> None:
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    conn = connect(db_path, shared_volume)
+    print(f"[INFO] Worker {owner} started on {db_path}")
+    try:
+        while True:
+            job = claim(conn, owner)
+            if job is None:
+                if once:
+                    print(f"[INFO] [{owner}] Queue drained.")
+                    return
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            print(f"[INFO] [{owner}] Claimed {job['id']} (attempt {job['attempts']}): {job['url']}")
+            try:
+                ok, detail = run_job(conn, job, owner, refresh, render_args)
+            except Exception as e:
+                ok, detail = False, f"worker error: {e}"
+
+            if ok:
+                if complete(conn, job["id"], owner):
+                    print(f"[SUCCESS] [{owner}] Finished {job['id']}")
+                else:
+                    print(f"[WARN] [{owner}] Finished {job['id']} after losing its lease; "
+                          f"left to the worker that holds it now.")
+            else:
+                new_status = release(conn, job["id"], owner, detail)
+                print(f"[ERROR] [{owner}] {job['id']} failed -> {new_status}")
+    finally:
+        conn.close()
+
+
+def _read_urls(sources: List[str]) -> List[str]:
+    urls: List[str] = []
+    for src in sources:
+        p = Path(src)
+        if p.is_file():
+            with p.open("r", encoding="utf-8", errors="ignore") as f:
+                urls.extend(line.strip() for line in f if line.strip())
+        else:
+            urls.append(src.strip())
+    return urls
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Lease-based work queue for script.py")
+    parser.add_argument("--db", default=QUEUE_DB, help=f"queue database path (default: {QUEUE_DB})")
+    parser.add_argument("--shared-volume", action="store_true",
+                        help="database is shared with workers on other hosts (rollback journal, not WAL)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_enq = sub.add_parser("enqueue", help="add URLs or files of URLs to the queue")
+    p_enq.add_argument("sources", nargs="+", help="URL(s) or text file(s) with one URL per line")
+
+    p_work = sub.add_parser("work", help="process queued URLs")
+    p_work.add_argument("--workers", type=int, default=1, help="number of local worker processes")
+    p_work.add_argument("--once", action="store_true", help="exit when nothing is claimable")
+    p_work.add_argument("--refresh", action="store_true",
+                        help="skip download/render for listings that have not changed")
+    p_work.add_argument("--max-dim", type=int, default=None,
+                        help="passed to script.py: longest side of the collage photo (0 = no limit)")
+    p_work.add_argument("--memory-budget-mb", type=int, default=None,
+                        help="passed to script.py: per-render pixel memory budget; with --workers N "
+                             "the renders can need up to N times this")
+
+    sub.add_parser("status", help="show job counts per status")
+    sub.add_parser("retry-failed", help="re-queue jobs that used up their attempts")
+    sub.add_parser("requeue-done", help="re-queue finished jobs for a refresh pass")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "work":
+        render_args: List[str] = []
+        if args.max_dim is not None:
+            render_args += ["--max-dim", str(args.max_dim)]
+        if args.memory_budget_mb:
+            render_args += ["--memory-budget-mb", str(args.memory_budget_mb)]
+        worker_args = (args.db, args.once, args.refresh, args.shared_volume, render_args)
+        if args.workers <= 1:
+            worker_loop(*worker_args)
+            return
+        procs = [multiprocessing.Process(target=worker_loop, args=worker_args)
+                 for _ in range(args.workers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        return
+
+    conn = connect(args.db, args.shared_volume)
+    try:
+        if args.command == "enqueue":
+            added = enqueue(conn, _read_urls(args.sources))
+            print(f"[INFO] Queued {added} new URL(s).")
+        elif args.command == "status":
+            for status, n in status_counts(conn):
+                print(f"{status:8} {n}")
+        elif args.command == "retry-failed":
+            print(f"[INFO] Re-queued {retry_failed(conn)} failed job(s).")
+        elif args.command == "requeue-done":
+            print(f"[INFO] Re-queued {requeue_done(conn)} finished job(s).")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()